@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import type_index
+from classifier import TypeClassifier
+from embedding_backends import HashingEmbeddingBackend, OpenAIEmbeddingBackend
+from type_index import build_type_index, load_type_index
+
+# 임베딩 백엔드별 지연시간/처리량/분류 결과를 fixture 가족 요약으로 비교합니다.
+#
+#   python benchmarks/bench_embedding_backends.py                      # hashing (+ OPENAI_API_KEY 가 있으면 openai)
+#   python benchmarks/bench_embedding_backends.py --backends hashing
+#
+# fixture 의 label 은 사람이 붙인 의도된 유형입니다. openai 백엔드를 같이 돌리면 ada 분류 결과와의 일치율도 출력합니다.
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'families.jsonl')
+
+def load_fixture(path=FIXTURE_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def make_backend(name):
+    if name == 'hashing':
+        return HashingEmbeddingBackend()
+    # 캐시가 켜져 있으면 두 번째 실행부터 지연시간이 0에 가까워지므로 벤치마크에서는 끕니다.
+    return OpenAIEmbeddingBackend(use_cache=False)
+
+def bench_backend(backend, texts, repeats):
+    start = time.perf_counter()
+    build_type_index(backend)
+    index_seconds = time.perf_counter() - start
+    classifier = TypeClassifier(load_type_index(backend.name), backend.temperature)
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        backend.embed([text])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        vectors = backend.embed(texts)
+    throughput = repeats * len(texts) / (time.perf_counter() - start)
+
+    predictions = [ranking[0]['family type'] for ranking in classifier.classify(vectors, k=1)]
+    return {
+        'index_seconds': index_seconds,
+        'p50_ms': 1000 * float(np.percentile(latencies, 50)),
+        'p95_ms': 1000 * float(np.percentile(latencies, 95)),
+        'texts_per_second': throughput,
+        'predictions': predictions,
+    }
+
+def agreement(a, b):
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 벤치마크")
+    default_backends = ['hashing', 'openai'] if os.getenv('OPENAI_API_KEY') else ['hashing']
+    parser.add_argument('--backends', nargs='+', default=default_backends, choices=['hashing', 'openai'])
+    parser.add_argument('--fixture', default=FIXTURE_PATH)
+    parser.add_argument('--repeats', type=int, default=3, help="처리량 측정 시 fixture 전체를 몇 번 임베딩할지")
+    args = parser.parse_args()
+    # 인덱스 빌드 시간을 재려고 매번 새로 빌드하므로, 실제 type_index/ 의 인덱스를 덮어쓰지 않게 임시 디렉토리에 만듭니다.
+    type_index.INDEX_DIR = os.path.join(tempfile.mkdtemp(prefix='faim-bench-'), 'type_index')
+
+    fixture = load_fixture(args.fixture)
+    texts = [row['summary'] for row in fixture]
+    labels = [row['label'] for row in fixture]
+
+    results = {name: bench_backend(make_backend(name), texts, args.repeats) for name in args.backends}
+
+    print(f"{'backend':<10} {'index(s)':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'texts/s':>10} {'label acc':>10} {'ada agree':>10}")
+    for name, result in results.items():
+        ada_agreement = agreement(result['predictions'], results['openai']['predictions']) if 'openai' in results else None
+        print(
+            f"{name:<10} {result['index_seconds']:>9.3f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['texts_per_second']:>10.1f} {agreement(result['predictions'], labels):>10.0%} "
+            f"{'-' if ada_agreement is None else format(ada_agreement, '.0%'):>10}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockConfig, start_server
+
+# 설문 → 구성원 요약 → 정보 추출 → 임베딩 → 분류 → 미션 저장소 조회 → 미션 생성까지 main.py 와 같은 작업 큐 경로를
+# mock OpenAI 서버에 대고 돌려서 단계별 지연시간, 호출 수, 토큰 수를 잽니다.
+#
+#   python benchmarks/bench_pipeline.py --sessions 50 --concurrency 8 --members 4
+#   python benchmarks/bench_pipeline.py --rpm 300 --json bench_output.json
+#
+# 세션당 API 호출 수가 (구성원 수 + 가족 요약 1 + 정보 추출 1 + 임베딩 1 + 미션 저장소 조회 임베딩 1 + 미션 1) 을 넘거나
+# --max-p95-ms 를 넘으면 exit code 1 로 끝나서 배포 전에 성능 회귀를 잡을 수 있습니다.
+
+STAGES = ['summary', 'extraction', 'embedding', 'classification', 'mission_lookup', 'mission_ttft', 'mission', 'total']
+# 작업 안에서 나온 span 이름 -> 벤치마크 단계. 임베딩은 분류 작업에서 바로 부른 것만 'embedding' 으로 셉니다.
+SPAN_STAGES = {
+    'summarize': 'summary',
+    'extract': 'extraction',
+    'classify': 'classification',
+    'mission_store.lookup': 'mission_lookup',
+}
+
+HOBBIES = ['hiking', 'painting', 'reading', 'soccer', 'baking', 'piano', 'camping', 'chess', 'swimming', 'gardening']
+JOBS = ['teacher', 'engineer', 'nurse', 'student', 'designer', 'researcher', 'chef', 'retired']
+ROLES = ['Dad', 'Mom', 'child', 'child', 'child', 'Grandmother', 'Grandfather']
+
+def random_member(rng, member_id, session_id):
+    # 세션마다 답변이 달라야 응답 캐시에 걸리지 않고 매번 실제 호출이 나갑니다.
+    return {
+        'role': ROLES[member_id],
+        'name': f"member-{session_id}-{member_id}",
+        'age': rng.randint(5, 75),
+        'hobby': rng.choice(HOBBIES),
+        'job': rng.choice(JOBS),
+        'weekend': f"{rng.choice(HOBBIES)} and {rng.choice(HOBBIES)}",
+    }
+
+def random_family(rng, session_id):
+    return {
+        'important_family_activity': f"{rng.choice(HOBBIES)} together (session {session_id})",
+        'time_spent_together': f"{rng.randint(2, 20)} hours",
+        'desired_activity': rng.choice(HOBBIES),
+    }
+
+class JobFailed(Exception):
+    pass
+
+def run_job(job_queue, kind, payload):
+    from job_queue import DONE
+
+    job = job_queue.run(kind, payload)
+    if job['status'] != DONE:
+        raise JobFailed(job['error'] or job['status'])
+    return job['result']
+
+def stage_timings(spans):
+    # 작업은 풀 스레드에서 돌기 때문에 단계별 시간은 세션 trace 에 남은 span 으로 잽니다.
+    by_id = {span['span_id']: span for span in spans}
+    timings = {}
+    for span in spans:
+        stage = SPAN_STAGES.get(span['name'])
+        parent = by_id.get(span['parent_span_id'])
+        if span['name'] == 'embedding' and parent is not None and parent['name'] == 'job':
+            stage = 'embedding'
+        if stage is not None:
+            timings[stage] = timings.get(stage, 0) + span['duration_ms'] / 1000
+    return timings
+
+def run_session(session_id, num_members, job_queue, seed):
+    import tracing
+    from prompt_builder import build_mission_prompt
+    from questionnaire import format_member_information, format_family_information
+
+    rng = random.Random(seed + session_id)
+    members = [random_member(rng, member_id, session_id) for member_id in range(num_members)]
+    family = random_family(rng, session_id)
+    # main.py 처럼 세션마다 trace id 를 두면 작업 span 들이 이 세션 trace 로 묶입니다.
+    trace_id = tracing.new_id(16)
+    tracing.set_trace_id(trace_id)
+
+    start = time.perf_counter()
+    summaries = run_job(job_queue, 'summarize', {
+        'members': [format_member_information(member) for member in members],
+        'family': format_family_information(family),
+    })['summaries']
+    classification = run_job(job_queue, 'classify', {'summaries': summaries})
+
+    family_type = classification['ranking'][0]
+    additional_needs = f"session {session_id}"
+    system_prompt, user_content, prompt_tokens = build_mission_prompt(summaries, family_type, additional_needs)
+    mission = run_job(job_queue, 'mission', {
+        'system_prompt': system_prompt,
+        'user_content': user_content,
+        'prompt_tokens': prompt_tokens,
+        'family_type': family_type['family type'],
+        'summaries': summaries,
+        'additional_needs': additional_needs,
+    })
+
+    timings = {stage: None for stage in STAGES}
+    timings.update(stage_timings(tracing.trace_spans(trace_id)))
+    timings['mission_ttft'] = mission['time_to_first_token']
+    timings['mission'] = mission['latency']
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+def run_session_safely(session_id, num_members, job_queue, seed):
+    # 재시도까지 다 실패한 세션은 벤치마크를 멈추지 않고 실패로 셉니다.
+    try:
+        return run_session(session_id, num_members, job_queue, seed), None
+    except JobFailed as e:
+        return None, str(e).split('(')[0]
+    except Exception as e:
+        return None, type(e).__name__
+
+def stage_of(request, prompts):
+    if request['path'] == '/v1/embeddings':
+        return 'embedding'
+    return prompts.get(request.get('system_prompt'), 'other')
+
+def percentile_ms(values, q):
+    return 1000 * float(np.percentile(values, q)) if values else float('nan')
+
+def main():
+    parser = argparse.ArgumentParser(description="mock OpenAI 서버로 전체 파이프라인 벤치마크")
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4, help="동시에 진행되는 사용자 세션 수")
+    parser.add_argument('--members', type=int, default=4, help="가족 구성원 수 (1~7)")
+    parser.add_argument('--latency', type=float, default=0.2, help="mock 서버 요청당 기본 지연(초)")
+    parser.add_argument('--latency-per-token', type=float, default=0.001)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--rpm', type=int, default=None, help="mock 서버 분당 요청 한도")
+    parser.add_argument('--embedding-backend', default='openai')
+    parser.add_argument('--job-workers', type=int, default=None, help="작업 큐 워커 수 (기본값: 앱과 같은 FAIM_JOB_WORKERS)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-calls-per-session', type=float, default=None, help="기본값: 구성원 수 + 5")
+    parser.add_argument('--max-p95-ms', type=float, default=None, help="세션 전체 p95 지연 한도")
+    parser.add_argument('--json', help="결과를 JSON 으로 저장할 경로")
+    args = parser.parse_args()
+
+    server = start_server(0, MockConfig(args.latency, args.latency_per_token, args.jitter, args.rpm))
+    workdir = tempfile.mkdtemp(prefix='faim-bench-')
+    # llm 은 import 시점에 클라이언트를 만드므로 환경 변수를 먼저 맞춰야 합니다.
+    # 캐시, 유형 인덱스, 트레이스, 작업 큐, 미션 저장소도 임시 디렉토리로 돌려서 실제 파일에 mock 응답이 섞이지 않게 합니다.
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ['OPENAI_API_KEY'] = 'mock'
+    os.environ['FAIM_CACHE_PATH'] = os.path.join(workdir, 'responses.sqlite3')
+    os.environ['FAIM_TRACE_PATH'] = os.path.join(workdir, 'spans.jsonl')
+    os.environ['FAIM_JOB_DB_PATH'] = os.path.join(workdir, 'jobs.sqlite3')
+    os.environ['FAIM_MISSION_STORE_PATH'] = os.path.join(workdir, 'missions.sqlite3')
+
+    import type_index
+    type_index.INDEX_DIR = os.path.join(workdir, 'type_index')
+    from classifier import TypeClassifier
+    from embedding_backends import get_backend
+    from job_queue import MAX_WORKERS
+    from jobs import make_job_queue
+    from prompts import MEMBER_SUMMARIZER_PROMPT, FAMILY_SUMMARIZER_PROMPT, INFORMATION_EXTRACTOR_PROMPT, MISSION_GENERATOR_PROMPT
+
+    prompts = {
+        MEMBER_SUMMARIZER_PROMPT: 'summary',
+        FAMILY_SUMMARIZER_PROMPT: 'summary',
+        INFORMATION_EXTRACTOR_PROMPT: 'extraction',
+        MISSION_GENERATOR_PROMPT: 'mission',
+    }
+
+    backend = get_backend(args.embedding_backend)
+    classifier = TypeClassifier(type_index.load_or_build_type_index(backend), backend.temperature)
+    job_queue = make_job_queue(backend, classifier, max_workers=args.job_workers or MAX_WORKERS)
+    server.state.reset()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        outcomes = list(pool.map(
+            lambda session_id: run_session_safely(session_id, args.members, job_queue, args.seed),
+            range(args.sessions)
+        ))
+    wall = time.perf_counter() - start
+    job_queue.shutdown()
+    server.shutdown()
+    sessions = [timings for timings, _ in outcomes if timings is not None]
+    errors = defaultdict(int)
+    for _, error in outcomes:
+        if error is not None:
+            errors[error] += 1
+
+    requests = server.state.snapshot()
+    calls = defaultdict(int)
+    prompt_tokens = defaultdict(int)
+    completion_tokens = defaultdict(int)
+    rate_limited = 0
+    for request in requests:
+        if request['status'] == 429:
+            rate_limited += 1
+            continue
+        stage = stage_of(request, prompts)
+        calls[stage] += 1
+        prompt_tokens[stage] += request.get('prompt_tokens', 0)
+        completion_tokens[stage] += request.get('completion_tokens', 0)
+
+    latency = {stage: [session[stage] for session in sessions if session[stage] is not None] for stage in STAGES}
+    calls_per_session = sum(calls.values()) / args.sessions
+    result = {
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'members': args.members,
+        'wall_seconds': wall,
+        'sessions_per_minute': 60 * len(sessions) / wall,
+        'failed_sessions': dict(errors),
+        'calls_per_session': calls_per_session,
+        'rate_limited_responses': rate_limited,
+        'latency_ms': {
+            stage: {q: percentile_ms(values, int(q[1:])) for q in ('p50', 'p95', 'p99')}
+            for stage, values in latency.items()
+        },
+        'per_stage': {
+            stage: {
+                'calls_per_session': calls[stage] / args.sessions,
+                'prompt_tokens_per_session': prompt_tokens[stage] / args.sessions,
+                'completion_tokens_per_session': completion_tokens[stage] / args.sessions,
+            }
+            for stage in sorted(calls)
+        },
+    }
+
+    print(f"{args.sessions} sessions x {args.members} members, concurrency {args.concurrency}: "
+          f"{wall:.1f}s, {result['sessions_per_minute']:.1f} sessions/min, {rate_limited} x 429, "
+          f"{sum(errors.values())} failed {dict(errors) if errors else ''}")
+    print(f"{'stage':<15} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for stage in STAGES:
+        row = result['latency_ms'][stage]
+        print(f"{stage:<15} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}")
+    print(f"{'stage':<15} {'calls':>9} {'prompt tok':>11} {'compl tok':>10}   (per session)")
+    for stage, row in result['per_stage'].items():
+        print(f"{stage:<15} {row['calls_per_session']:>9.2f} {row['prompt_tokens_per_session']:>11.1f} {row['completion_tokens_per_session']:>10.1f}")
+    print(f"calls per classification: {calls_per_session:.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if errors:
+        failures.append(f"{sum(errors.values())} of {args.sessions} sessions failed")
+    max_calls = args.max_calls_per_session if args.max_calls_per_session is not None else args.members + 5
+    if calls_per_session > max_calls:
+        failures.append(f"calls per session {calls_per_session:.2f} > {max_calls}")
+    if args.max_p95_ms is not None and result['latency_ms']['total']['p95'] > args.max_p95_ms:
+        failures.append(f"total p95 {result['latency_ms']['total']['p95']:.1f}ms > {args.max_p95_ms}ms")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
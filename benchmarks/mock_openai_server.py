@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# 벤치마크용 OpenAI 호환 HTTP 서버입니다. /v1/chat/completions (stream 포함) 와 /v1/embeddings 만 흉내 냅니다.
+# 실제 API 대신 OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 로 붙여서 지연시간, rate limit, 호출 수를 재현합니다.
+#
+#   python benchmarks/mock_openai_server.py --port 8765 --latency 0.4 --rpm 600
+#
+# GET /stats 는 지금까지 받은 요청 기록을, POST /reset 은 기록 초기화를 합니다.
+
+DEFAULT_SUMMARY = "This family member enjoys spending weekends outdoors and values time together with family. They are interested in trying new activities as a family."
+DEFAULT_EXTRACTION = {
+    'Extracted_info': "The family enjoys outdoor activities, cooking together and learning new things.",
+    'Summarization': "An active family that enjoys hiking and camping, cooks together at home and likes visiting museums on weekends.",
+}
+DEFAULT_MISSION = "1. 가족 보물찾기: 집 안에 단서를 숨기고 30분 안에 함께 보물을 찾아보세요.\n2. 가족 요리 대회: 냉장고 재료로 팀을 나눠 간단한 요리를 만들고 서로 맛을 평가해보세요."
+EMBEDDING_DIMENSIONS = 1536
+
+def approximate_tokens(text):
+    return max(1, len(text) // 4)
+
+class MockConfig:
+    def __init__(self, latency=0.3, latency_per_token=0.002, jitter=0.1, rpm=None, error_rate=0.0, canned=None):
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.jitter = jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        # 시스템 프롬프트에 포함된 문자열 -> 돌려줄 응답. 못 찾으면 기본 응답을 씁니다.
+        self.canned = canned or {}
+
+class MockState:
+    def __init__(self, config):
+        self.config = config
+        self.requests = []
+        self._lock = threading.Lock()
+        self._tokens = float(config.rpm or 0)
+        self._refilled_at = time.monotonic()
+
+    def take_request_slot(self):
+        # 분당 rpm 개가 채워지는 token bucket. 비어 있으면 (False, 다음 슬롯까지 초) 를 돌려줍니다.
+        if not self.config.rpm:
+            return True, 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.config.rpm, self._tokens + (now - self._refilled_at) * self.config.rpm / 60)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0
+            return False, (1 - self._tokens) * 60 / self.config.rpm
+
+    def record(self, **entry):
+        with self._lock:
+            self.requests.append(entry)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.requests)
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+def make_handler(state):
+    config = state.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                self.send_json(200, {'requests': state.snapshot()})
+            else:
+                self.send_json(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            path = self.path.rstrip('/')
+            if path == '/reset':
+                state.reset()
+                return self.send_json(200, {})
+            if path not in ('/v1/chat/completions', '/v1/embeddings'):
+                return self.send_json(404, {'error': {'message': 'not found'}})
+
+            allowed, retry_after = state.take_request_slot()
+            if not allowed:
+                state.record(path=path, model=body.get('model'), status=429, system_prompt=system_prompt_of(body))
+                return self.send_json(
+                    429,
+                    {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                    {
+                        'retry-after-ms': str(int(retry_after * 1000)),
+                        'x-ratelimit-limit-requests': str(config.rpm),
+                        'x-ratelimit-remaining-requests': '0',
+                        'x-ratelimit-reset-requests': f"{retry_after:.3f}s",
+                    }
+                )
+            if random.random() < config.error_rate:
+                state.record(path=path, model=body.get('model'), status=500, system_prompt=system_prompt_of(body))
+                return self.send_json(500, {'error': {'message': 'mock server error', 'type': 'server_error'}})
+
+            if path == '/v1/embeddings':
+                self.embeddings(body)
+            elif body.get('stream'):
+                self.stream_chat(body)
+            else:
+                self.chat(body)
+
+        def rate_limit_headers(self):
+            if not config.rpm:
+                return {}
+            return {
+                'x-ratelimit-limit-requests': str(config.rpm),
+                'x-ratelimit-remaining-requests': str(int(state._tokens)),
+                'x-ratelimit-reset-requests': f"{60 / config.rpm:.3f}s",
+            }
+
+        def sleep_for(self, completion_tokens):
+            time.sleep(max(0, config.latency + config.latency_per_token * completion_tokens + random.uniform(-config.jitter, config.jitter)))
+
+        def chat(self, body):
+            content = canned_response(config, body)
+            prompt_tokens = sum(approximate_tokens(m['content']) for m in body['messages'])
+            completion_tokens = approximate_tokens(content)
+            self.sleep_for(completion_tokens)
+            state.record(path='/v1/chat/completions', model=body['model'], status=200, system_prompt=system_prompt_of(body),
+                         prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            self.send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body['model'],
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+            }, self.rate_limit_headers())
+
+        def stream_chat(self, body):
+            content = canned_response(config, body)
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            prompt_tokens = sum(approximate_tokens(m['content']) for m in body['messages'])
+            time.sleep(max(0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            for key, value in self.rate_limit_headers().items():
+                self.send_header(key, value)
+            self.end_headers()
+            try:
+                for piece in pieces:
+                    chunk = {
+                        'id': 'chatcmpl-mock',
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': body['model'],
+                        'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}],
+                    }
+                    self.write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+                    time.sleep(config.latency_per_token)
+                self.write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                completed = True
+            except (BrokenPipeError, ConnectionResetError):
+                completed = False
+            state.record(path='/v1/chat/completions', model=body['model'], status=200, system_prompt=system_prompt_of(body),
+                         prompt_tokens=prompt_tokens, completion_tokens=len(pieces), stream=True, completed=completed)
+
+        def write_chunk(self, text):
+            data = text.encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def embeddings(self, body):
+            texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+            self.sleep_for(0)
+            data = [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(text)} for i, text in enumerate(texts)]
+            prompt_tokens = sum(approximate_tokens(text) for text in texts)
+            state.record(path='/v1/embeddings', model=body['model'], status=200, inputs=len(texts), prompt_tokens=prompt_tokens, completion_tokens=0)
+            self.send_json(200, {
+                'object': 'list',
+                'model': body['model'],
+                'data': data,
+                'usage': {'prompt_tokens': prompt_tokens, 'total_tokens': prompt_tokens},
+            }, self.rate_limit_headers())
+
+    return Handler
+
+def system_prompt_of(body):
+    for message in body.get('messages', []):
+        if message['role'] == 'system':
+            return message['content']
+    return None
+
+def user_content_of(body):
+    return "\n".join(message['content'] for message in body.get('messages', []) if message['role'] == 'user')
+
+def canned_response(config, body):
+    system_prompt = system_prompt_of(body) or ""
+    for needle, response in config.canned.items():
+        if needle in system_prompt:
+            return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+    # 입력마다 응답이 조금씩 달라야 다음 단계(추출, 임베딩)가 응답 캐시에 걸리지 않습니다.
+    digest = hashlib.sha256(user_content_of(body).encode('utf-8')).hexdigest()[:8]
+    if (body.get('response_format') or {}).get('type') == 'json_object':
+        extraction = dict(DEFAULT_EXTRACTION)
+        extraction['Summarization'] += f" (family {digest})"
+        return json.dumps(extraction, ensure_ascii=False)
+    if 'mission' in system_prompt.lower():
+        return DEFAULT_MISSION
+    return f"{DEFAULT_SUMMARY} (member {digest})"
+
+def fake_embedding(text):
+    # 같은 텍스트면 같은 벡터가 나오도록 텍스트 해시로 시드를 잡습니다.
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'little')
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+class MockServer(ThreadingHTTPServer):
+    # 기본 listen backlog(5)로는 동시 세션이 많을 때 연결이 밀려서 SYN 재전송(1초)이 지연시간에 섞입니다.
+    request_queue_size = 256
+    daemon_threads = True
+
+def start_server(port=0, config=None):
+    state = MockState(config or MockConfig())
+    server = MockServer(('127.0.0.1', port), make_handler(state))
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 OpenAI 호환 mock 서버")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3, help="요청당 기본 지연(초)")
+    parser.add_argument('--latency-per-token', type=float, default=0.002, help="출력 토큰당 추가 지연(초)")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--rpm', type=int, default=None, help="분당 요청 한도 (넘으면 429)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="500 을 돌려줄 확률")
+    parser.add_argument('--canned', help="시스템 프롬프트 일부 -> 응답 JSON 파일")
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding='utf-8') as f:
+            canned = json.load(f)
+    server = start_server(args.port, MockConfig(args.latency, args.latency_per_token, args.jitter, args.rpm, args.error_rate, canned))
+    print(f"mock OpenAI server on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
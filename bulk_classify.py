@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from classifier import TypeClassifier
+from extractor import extract_family_info_async
+from embedding_backends import DEFAULT_BACKEND, get_backend
+from llm import MAX_CONCURRENT_CALLS, EMBEDDING_BATCH_SIZE, make_async_client
+from rate_limiter import BULK, set_priority
+from questionnaire import format_member_information, format_family_information
+from summarizer import summarize_family_async
+from type_index import load_or_build_type_index
+
+# 저장된 설문 기록(JSONL)을 streamlit 없이 요약 → 정보 추출 → 임베딩 → 분류까지 돌립니다.
+# 입력 한 줄은 {"id": ..., "members": [{"role": "Dad", "name": ..., "age": ..., ...}], "family": {...}} 형태입니다.
+#
+#   python bulk_classify.py records.jsonl results.jsonl --concurrency 16
+#
+# 결과 파일이 체크포인트 역할을 합니다. 중간에 죽어도 같은 명령으로 다시 실행하면 이미 기록된 id는 건너뜁니다.
+
+TOP_K = 3
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault('id', str(line_number))
+            yield record
+
+def load_done_ids(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    good_size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                break
+            good_size += len(line)
+    # 쓰다가 죽어서 잘린 마지막 줄은 잘라내고 그 기록부터 다시 처리합니다.
+    if good_size != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good_size)
+    return done
+
+def write_lines(f, rows):
+    for row in rows:
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+async def summarize_and_extract(aclient, semaphore, record):
+    summaries_with_usage = await summarize_family_async(
+        [format_member_information(member) for member in record['members']],
+        format_family_information(record['family']) if record.get('family') else None,
+        aclient=aclient,
+        semaphore=semaphore
+    )
+    summaries = [summary for summary, _ in summaries_with_usage]
+    extracted, extract_usage = await extract_family_info_async(aclient, semaphore, summaries)
+    usages = [usage for _, usage in summaries_with_usage] + [extract_usage]
+    return {
+        'id': record['id'],
+        'summaries': summaries,
+        'extracted': extracted,
+        'extraction_model': extract_usage['model'],
+        'extraction_fallback_from': extract_usage.get('fallback_from'),
+        'prompt_tokens': sum(usage['prompt_tokens'] for usage in usages if not usage['cached']),
+        'completion_tokens': sum(usage['completion_tokens'] for usage in usages if not usage['cached']),
+    }
+
+async def classify_batch(aclient, semaphore, backend, classifier, rows, k):
+    embeddings = await backend.aembed(aclient, semaphore, [row['extracted']['Summarization'] for row in rows])
+    rankings = classifier.classify(embeddings, k=k)
+    for row, ranking in zip(rows, rankings):
+        row['family_type'] = ranking[0]['family type']
+        row['score'] = ranking[0]['score']
+        row['top_k'] = [
+            {'family type': result['family type'], 'similarity': result['similarity'], 'score': result['score']}
+            for result in ranking
+        ]
+    return rows
+
+async def run(input_path, output_path, concurrency, batch_size, backend_name, k):
+    # 일괄 작업이라 rate limit 중 BULK_RESERVE 만큼은 streamlit 앱 몫으로 남겨두고 보냅니다.
+    set_priority(BULK)
+    backend = get_backend(backend_name)
+    classifier = TypeClassifier(load_or_build_type_index(backend), backend.temperature)
+    done = load_done_ids(output_path)
+    records = (record for record in read_records(input_path) if record['id'] not in done)
+    semaphore = asyncio.Semaphore(concurrency)
+    error_path = output_path + '.errors.jsonl'
+
+    start = time.perf_counter()
+    processed = 0
+    failed = 0
+    pending = []
+    in_flight = set()
+    exhausted = False
+
+    async with make_async_client() as aclient:
+        with open(output_path, 'a', encoding='utf-8') as out, open(error_path, 'a', encoding='utf-8') as errors:
+            while in_flight or not exhausted or pending:
+                # API 호출 수는 semaphore 가 제한하고, 메모리에 올라오는 기록 수는 여기서 제한합니다.
+                while not exhausted and len(in_flight) < concurrency * 2:
+                    record = next(records, None)
+                    if record is None:
+                        exhausted = True
+                        break
+                    task = asyncio.ensure_future(summarize_and_extract(aclient, semaphore, record))
+                    task.record_id = record['id']
+                    in_flight.add(task)
+
+                if in_flight:
+                    finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in finished:
+                        if task.exception() is not None:
+                            failed += 1
+                            write_lines(errors, [{'id': task.record_id, 'error': repr(task.exception())}])
+                        else:
+                            pending.append(task.result())
+
+                if len(pending) >= batch_size or (pending and not in_flight and exhausted):
+                    rows = await classify_batch(aclient, semaphore, backend, classifier, pending, k)
+                    write_lines(out, rows)
+                    processed += len(rows)
+                    pending = []
+                    elapsed = time.perf_counter() - start
+                    print(f"{processed} families classified, {failed} failed, {60 * processed / elapsed:.1f} families/min")
+
+    return processed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="저장된 가족 설문 기록을 일괄로 가족 유형 분류합니다.")
+    parser.add_argument('input', help="설문 기록 JSONL 파일")
+    parser.add_argument('output', help="분류 결과 JSONL 파일 (체크포인트 겸용)")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_CALLS, help="동시에 보낼 API 요청 수")
+    parser.add_argument('--batch-size', type=int, default=64, help="임베딩 요청 하나에 묶을 가족 수")
+    parser.add_argument('--embedding-backend', default=DEFAULT_BACKEND, help="openai, hashing 또는 text-embedding-* 모델명")
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    processed, failed = asyncio.run(run(
+        args.input,
+        args.output,
+        args.concurrency,
+        min(args.batch_size, EMBEDDING_BATCH_SIZE),
+        args.embedding_backend,
+        args.top_k
+    ))
+    print(f"done: {processed} classified, {failed} failed (see {args.output}.errors.jsonl)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import CANCELLED, DONE, FAILED, JobQueue
+
+# job_queue.py 의 중복 제출, 대기 중 취소, 취소 후 재제출을 확인합니다. 실패하면 AssertionError 로 끝납니다.
+#
+#   python checks/check_job_queue.py
+
+TIMEOUT = 5
+
+def make_queue(max_workers=2):
+    return JobQueue(os.path.join(tempfile.mkdtemp(prefix='faim-check-'), 'jobs.sqlite3'), max_workers=max_workers)
+
+def check_dedupe():
+    # 같은 입력은 같은 키가 되고, 대기 중이든 끝났든 핸들러는 한 번만 돕니다.
+    queue = make_queue()
+    calls = []
+    release = threading.Event()
+    def handler(payload, context):
+        calls.append(payload)
+        release.wait(TIMEOUT)
+        return {'n': payload['n']}
+    queue.register('echo', handler)
+    first = queue.submit('echo', {'n': 1})
+    assert queue.submit('echo', {'n': 1}) == first
+    release.set()
+    assert queue.wait(first, TIMEOUT)['status'] == DONE
+    assert queue.submit('echo', {'n': 1}) == first
+    assert queue.wait(first, TIMEOUT)['result'] == {'n': 1}
+    assert len(calls) == 1, calls
+    queue.shutdown()
+
+def check_cancel_while_queued():
+    # 워커가 하나뿐이라 두 번째 작업이 큐에서 기다리는 동안 취소하면 핸들러를 부르지 않고 끝납니다.
+    queue = make_queue(max_workers=1)
+    calls = []
+    release = threading.Event()
+    def handler(payload, context):
+        calls.append(payload)
+        release.wait(TIMEOUT)
+        return {}
+    queue.register('block', handler)
+    running = queue.submit('block', {'n': 1})
+    queued = queue.submit('block', {'n': 2})
+    queue.cancel(queued)
+    release.set()
+    assert queue.wait(running, TIMEOUT)['status'] == DONE
+    assert queue.wait(queued, TIMEOUT)['status'] == CANCELLED
+    assert calls == [{'n': 1}], calls
+    queue.shutdown()
+
+def make_stream_handler(runs):
+    def handler(payload, context):
+        runs.append(payload)
+        text = ""
+        for _ in range(10):
+            if context.cancelled:
+                break
+            text += "x"
+            context.progress(text, force=True)
+            time.sleep(0.05)
+        return {'text': text}
+    return handler
+
+def check_cancel_then_resubmit():
+    # 요청사항을 A, B, 다시 A 로 바꾸는 경우입니다. 취소 중인 A 를 돌려주지 않고 끝까지 다시 돌립니다.
+    queue = make_queue()
+    runs = []
+    queue.register('stream', make_stream_handler(runs))
+    a = queue.submit('stream', {'needs': 'A'})
+    time.sleep(0.12)
+    b = queue.submit('stream', {'needs': 'B'})
+    queue.cancel(a)
+    assert queue.submit('stream', {'needs': 'A'}) == a
+    queue.cancel(b)
+    job = queue.wait(a, TIMEOUT)
+    assert job['status'] == DONE, job
+    assert job['result']['text'] == "x" * 10, job
+    assert job['progress'] == "x" * 10, job
+    assert queue.wait(b, TIMEOUT)['status'] == CANCELLED
+    assert [run['needs'] for run in runs].count('A') == 2, runs
+    queue.shutdown()
+
+def check_cancel_after_retry():
+    # 실패한 작업을 다시 제출한 뒤에도 cancel() 로 멈출 수 있습니다.
+    queue = make_queue(max_workers=1)
+    attempts = []
+    def handler(payload, context):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("first attempt fails")
+        while not context.cancelled:
+            time.sleep(0.02)
+        return {}
+    queue.register('flaky', handler)
+    key = queue.submit('flaky', {})
+    assert queue.wait(key, TIMEOUT)['status'] == FAILED
+    assert queue.submit('flaky', {}) == key
+    time.sleep(0.1)
+    queue.cancel(key)
+    assert queue.wait(key, TIMEOUT)['status'] == CANCELLED
+    queue.shutdown()
+
+def check_not_reusable_result():
+    # reusable 이 False 를 돌려주는 끝난 작업은 다시 제출하면 다시 돌립니다.
+    queue = make_queue()
+    calls = []
+    def handler(payload, context):
+        calls.append(1)
+        return {'degraded': len(calls) == 1}
+    queue.register('classify', handler, reusable=lambda result: not result['degraded'])
+    assert queue.run('classify', {}, timeout=TIMEOUT)['result'] == {'degraded': True}
+    assert queue.run('classify', {}, timeout=TIMEOUT)['result'] == {'degraded': False}
+    queue.run('classify', {}, timeout=TIMEOUT)
+    assert len(calls) == 2, calls
+    queue.shutdown()
+
+CHECKS = [
+    check_dedupe,
+    check_cancel_while_queued,
+    check_cancel_then_resubmit,
+    check_cancel_after_retry,
+    check_not_reusable_result,
+]
+
+if __name__ == '__main__':
+    for check in CHECKS:
+        check()
+        print(f"ok  {check.__name__}")
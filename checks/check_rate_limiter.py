@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# llm 은 import 시점에 OpenAI 클라이언트를 만들기 때문에 키가 없으면 가짜 키를 넣어둡니다. 실제 요청은 보내지 않습니다.
+os.environ.setdefault('OPENAI_API_KEY', 'check')
+
+import llm
+import rate_limiter
+from rate_limiter import BULK, INTERACTIVE, RateLimitScheduler
+
+# rate_limiter.py 의 우선순위, BULK 예약분, 토큰 환불을 확인합니다. 실패하면 AssertionError 로 끝납니다.
+#
+#   python checks/check_rate_limiter.py
+
+MODEL = 'check-model'
+
+def limited_scheduler(rpm=None, remaining_requests=None, tpm=None, remaining_tokens=None):
+    scheduler = RateLimitScheduler()
+    headers = {}
+    if rpm is not None:
+        headers['x-ratelimit-limit-requests'] = str(rpm)
+        headers['x-ratelimit-remaining-requests'] = str(remaining_requests)
+    if tpm is not None:
+        headers['x-ratelimit-limit-tokens'] = str(tpm)
+        headers['x-ratelimit-remaining-tokens'] = str(remaining_tokens)
+    scheduler.observe(MODEL, headers)
+    return scheduler
+
+@contextmanager
+def bulk_reserve(value):
+    original = rate_limiter.BULK_RESERVE
+    rate_limiter.BULK_RESERVE = value
+    try:
+        yield
+    finally:
+        rate_limiter.BULK_RESERVE = original
+
+def check_priority_order():
+    # 버킷이 빈 상태에서 BULK 가 먼저 줄을 서도 나중에 온 INTERACTIVE 가 먼저 나갑니다.
+    # 예약분과 섞이지 않도록 순서만 볼 때는 예약분을 끕니다.
+    scheduler = limited_scheduler(rpm=120, remaining_requests=0)
+    order = []
+    def take(priority):
+        scheduler.acquire(MODEL, priority=priority)
+        order.append(priority)
+    with bulk_reserve(0.0):
+        bulk = threading.Thread(target=take, args=(BULK,))
+        bulk.start()
+        time.sleep(0.1)
+        interactive = threading.Thread(target=take, args=(INTERACTIVE,))
+        interactive.start()
+        bulk.join(5)
+        interactive.join(5)
+    assert order == [INTERACTIVE, BULK], order
+
+def check_async_priority_order():
+    scheduler = limited_scheduler(rpm=120, remaining_requests=0)
+    order = []
+    async def take(priority, delay):
+        await asyncio.sleep(delay)
+        await scheduler.aacquire(MODEL, priority=priority)
+        order.append(priority)
+    async def main():
+        await asyncio.wait_for(asyncio.gather(take(BULK, 0), take(INTERACTIVE, 0.1)), 5)
+    with bulk_reserve(0.0):
+        asyncio.run(main())
+    assert order == [INTERACTIVE, BULK], order
+
+def check_bulk_reserve():
+    # 남은 요청이 예약분 아래면 INTERACTIVE 는 바로 나가고 BULK 는 기다립니다.
+    scheduler = limited_scheduler(rpm=100, remaining_requests=int(100 * rate_limiter.BULK_RESERVE))
+    assert scheduler.pressure(MODEL, priority=INTERACTIVE) == 0
+    assert scheduler.pressure(MODEL, priority=BULK) > 0
+    assert scheduler.acquire(MODEL, priority=INTERACTIVE) < 0.1
+
+    async def bulk_acquire():
+        await asyncio.wait_for(scheduler.aacquire(MODEL, priority=BULK), 0.2)
+    try:
+        asyncio.run(bulk_acquire())
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("BULK acquire went through the reserve")
+    # 시간 초과로 빠진 BULK 호출은 줄에 남지 않습니다.
+    assert scheduler.stats()[MODEL]['queued'] == 0
+
+    # 예약분 위로 여유가 있으면 BULK 도 바로 나갑니다.
+    scheduler = limited_scheduler(rpm=100, remaining_requests=100)
+    assert scheduler.acquire(MODEL, priority=BULK) < 0.1
+
+def check_settle_refunds_failed_attempts():
+    # 두 번 실패하고 세 번째에 성공하면 버킷에는 실제로 쓴 토큰만 빠져 있어야 합니다.
+    scheduler = limited_scheduler(tpm=100000, remaining_tokens=100000)
+    attempts = []
+    def make_request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise asyncio.TimeoutError()
+        usage = SimpleNamespace(total_tokens=1500)
+        return SimpleNamespace(headers={}, parse=lambda: SimpleNamespace(usage=usage))
+    original = llm.scheduler
+    llm.scheduler = scheduler
+    try:
+        llm.request(make_request, MODEL, tokens=4000, max_retries=2)
+    finally:
+        llm.scheduler = original
+    available = scheduler.stats()[MODEL]['available_tokens']
+    assert len(attempts) == 3
+    assert 100000 - 1500 <= available < 100000 - 1500 + 100, available
+
+def check_settle_without_limits():
+    # 한도를 모르는 모델은 settle 해도 버킷이 생기지 않습니다.
+    scheduler = RateLimitScheduler()
+    scheduler.acquire(MODEL, tokens=100)
+    scheduler.settle(MODEL, 100, 0)
+    assert scheduler.stats()[MODEL]['tpm'] is None
+
+CHECKS = [
+    check_priority_order,
+    check_async_priority_order,
+    check_bulk_reserve,
+    check_settle_refunds_failed_attempts,
+    check_settle_without_limits,
+]
+
+if __name__ == '__main__':
+    for check in CHECKS:
+        check()
+        print(f"ok  {check.__name__}")
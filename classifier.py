@@ -0,0 +1,47 @@
+import numpy as np
+
+# ada 임베딩끼리의 코사인 유사도는 대부분 0.7~0.85 사이에 몰려 있어서 그대로 쓰면 유형 간 차이가 안 보입니다.
+# 유사도를 temperature 로 나눈 softmax 로 바꿔서 유형별 확률처럼 읽히게 합니다.
+SOFTMAX_TEMPERATURE = 0.01
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class TypeClassifier:
+    def __init__(self, type_vector, temperature=SOFTMAX_TEMPERATURE):
+        self.family_types = [vector['family type'] for vector in type_vector]
+        self.type_descriptions = [vector['type description'] for vector in type_vector]
+        self.temperature = temperature
+        matrix = np.asarray([vector['embedded vector'] for vector in type_vector], dtype=np.float32)
+        # (유형 수, 차원) float32 행렬 하나로 미리 정규화해 두면 점수 계산은 행렬곱 한 번입니다.
+        self.type_matrix = np.ascontiguousarray(normalize_rows(matrix))
+
+    def similarities(self, family_vectors):
+        family_matrix = np.atleast_2d(np.asarray(family_vectors, dtype=np.float32))
+        return normalize_rows(family_matrix) @ self.type_matrix.T
+
+    def classify(self, family_vectors, k=None, temperature=None):
+        similarities = self.similarities(family_vectors)
+        scores = softmax(similarities / (temperature or self.temperature))
+        k = k or len(self.family_types)
+        top_k = np.argsort(-scores, axis=1)[:, :k]
+
+        results = []
+        for row, indices in enumerate(top_k):
+            results.append([
+                {
+                    'family type': self.family_types[i],
+                    'type description': self.type_descriptions[i],
+                    'similarity': float(similarities[row, i]),
+                    'score': float(scores[row, i]),
+                }
+                for i in indices
+            ])
+        return results
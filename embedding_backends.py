@@ -0,0 +1,84 @@
+import hashlib
+import math
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from family_types import FAMILY_TYPES
+
+# 가족 유형 분류에 쓰는 임베딩 백엔드입니다. 백엔드마다 name 이 달라서 유형 인덱스도 백엔드별로 따로 빌드됩니다.
+#   embed(texts)                      -> 텍스트마다 벡터 하나
+#   aembed(aclient, semaphore, texts) -> 일괄 분류(bulk_classify)용 async 버전
+#   temperature                       -> 이 백엔드의 유사도 분포에 맞춘 TypeClassifier softmax temperature
+DEFAULT_BACKEND = os.getenv('FAIM_EMBEDDING_BACKEND', 'openai')
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+class OpenAIEmbeddingBackend:
+    # llm 은 import 시점에 OpenAI 클라이언트를 만들기 때문에, API 키 없이 hashing 백엔드만 쓸 때도
+    # import 가 되도록 실제 호출할 때 불러옵니다.
+    def __init__(self, model=OPENAI_EMBEDDING_MODEL, use_cache=True):
+        self.model = model
+        self.name = model
+        self.use_cache = use_cache
+        self.temperature = 0.01
+
+    def embed(self, texts):
+        from llm import get_embeddings
+        return get_embeddings(texts, model=self.model, use_cache=self.use_cache)
+
+    async def aembed(self, aclient, semaphore, texts):
+        from llm import aget_embeddings
+        return await aget_embeddings(aclient, semaphore, texts, model=self.model, use_cache=self.use_cache)
+
+class HashingEmbeddingBackend:
+    # 네트워크 없이 CPU 에서 도는 TF-IDF 백엔드입니다. 단어/바이그램을 고정 크기 벡터로 해싱하고,
+    # IDF 는 유형 설명과 미션 예시(family_types.py)로 계산합니다.
+    def __init__(self, n_features=2 ** 14, family_types=FAMILY_TYPES):
+        self.n_features = n_features
+        # 희소 벡터라 유사도가 0~0.3 정도로 넓게 퍼지므로 ada 보다 temperature 를 높게 둡니다.
+        self.temperature = 0.05
+        corpus = [
+            t['Family Type Description'] + " " + " ".join(t['Mission Examples'])
+            for t in family_types
+        ]
+        document_frequency = np.zeros(n_features, dtype=np.float32)
+        for document in corpus:
+            document_frequency[list(set(self._hash(token) for token in self._tokenize(document)))] += 1
+        # 코퍼스에 없는 토큰은 가장 희귀한 토큰과 같은 가중치를 받습니다.
+        self.idf = np.log((1 + len(corpus)) / (1 + document_frequency)).astype(np.float32) + 1
+        # 미션 예시가 바뀌면 IDF 도 바뀌므로, 예전 IDF 로 만든 유형 인덱스와 저장된 미션을 쓰지 않도록 이름에 IDF 지문을 넣습니다.
+        self.name = f"hashing-tfidf-{n_features}-{hashlib.sha256(self.idf.tobytes()).hexdigest()[:8]}"
+
+    @staticmethod
+    def _tokenize(text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return words + [a + " " + b for a, b in zip(words, words[1:])]
+
+    def _hash(self, token):
+        # 파이썬 hash() 는 프로세스마다 달라지므로 crc32 를 씁니다.
+        return zlib.crc32(token.encode('utf-8')) % self.n_features
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(self._tokenize(text)).items():
+                vectors[row, self._hash(token)] += 1 + math.log(count)
+        vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    async def aembed(self, aclient, semaphore, texts):
+        return self.embed(texts)
+
+def get_backend(name=DEFAULT_BACKEND):
+    if name == 'openai':
+        return OpenAIEmbeddingBackend()
+    if name == 'hashing':
+        return HashingEmbeddingBackend()
+    if name.startswith('text-embedding-'):
+        return OpenAIEmbeddingBackend(name)
+    raise ValueError(f"unknown embedding backend: {name} (openai, hashing, text-embedding-*)")
@@ -0,0 +1,53 @@
+import json
+import os
+
+import tracing
+from llm import chat_completion, achat_completion, is_chat_cached, COMPLETION_TOKEN_ESTIMATE
+from prompt_builder import build_extraction_prompt
+from rate_limiter import scheduler
+
+EXTRACTOR_MODEL = 'gpt-4-turbo-preview'
+# gpt-4 쪽 rate limit 에 밀려서 이 시간(초) 넘게 기다려야 하면 추출을 더 싼 모델로 보냅니다.
+FALLBACK_EXTRACTOR_MODEL = 'gpt-3.5-turbo-0125'
+FALLBACK_AFTER = float(os.getenv('FAIM_EXTRACTOR_FALLBACK_AFTER', '5'))
+
+RESPONSE_FORMAT = {'type': 'json_object'}
+
+def choose_extractor_model(model, system_prompt, family_record, prompt_tokens):
+    # 원래 모델 응답이 캐시에 있으면 기다릴 필요가 없으므로 대체 모델로 새로 부르지 않습니다.
+    if is_chat_cached(model, system_prompt, family_record, response_format=RESPONSE_FORMAT):
+        return model, None
+    chosen = scheduler.choose_model(model, FALLBACK_EXTRACTOR_MODEL, prompt_tokens + COMPLETION_TOKEN_ESTIMATE, FALLBACK_AFTER)
+    return chosen, (model if chosen != model else None)
+
+def record_fallback(span, content, usage, fallback_from):
+    # 결과에 어떤 모델로 추출했는지 남겨서 대체 모델로 나간 기록을 나중에 골라낼 수 있게 합니다.
+    usage = dict(usage, fallback_from=fallback_from)
+    span.set(fallback_from=fallback_from)
+    return json.loads(content), usage
+
+def extract_family_info(summaries, model=EXTRACTOR_MODEL):
+    with tracing.span('extract') as span:
+        system_prompt, family_record, prompt_tokens = build_extraction_prompt(summaries)
+        model, fallback_from = choose_extractor_model(model, system_prompt, family_record, prompt_tokens)
+        content, usage = chat_completion(
+            model,
+            system_prompt,
+            family_record,
+            response_format=RESPONSE_FORMAT
+        )
+        return record_fallback(span, content, usage, fallback_from)
+
+async def extract_family_info_async(aclient, semaphore, summaries, model=EXTRACTOR_MODEL):
+    with tracing.span('extract') as span:
+        system_prompt, family_record, prompt_tokens = build_extraction_prompt(summaries)
+        model, fallback_from = choose_extractor_model(model, system_prompt, family_record, prompt_tokens)
+        content, usage = await achat_completion(
+            aclient,
+            semaphore,
+            model,
+            system_prompt,
+            family_record,
+            response_format=RESPONSE_FORMAT
+        )
+        return record_fallback(span, content, usage, fallback_from)
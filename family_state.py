@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+
+# 구성원 답변이 바뀌었을 때만 dirty 로 표시해서, '가족 유형 확인' 때 바뀐 구성원만 다시 요약합니다.
+# 7명까지 세션마다 들고 있는 객체라 __slots__ 로 인스턴스 dict 를 없앱니다.
+
+@dataclass
+class MemberState:
+    __slots__ = ('member_id', 'answers', 'summary', 'dirty')
+    member_id: int
+    answers: dict
+    summary: str
+    dirty: bool
+
+    def update(self, answers):
+        if answers != self.answers:
+            self.answers = dict(answers)
+            self.dirty = True
+        return self.dirty
+
+@dataclass
+class FamilyState:
+    __slots__ = ('members', 'family_answers', 'family_summary', 'family_dirty')
+    members: dict
+    family_answers: dict
+    family_summary: str
+    family_dirty: bool
+
+    @classmethod
+    def empty(cls):
+        return cls({}, {}, None, False)
+
+    def resize(self, num_members):
+        for member_id in range(num_members):
+            if member_id not in self.members:
+                self.members[member_id] = MemberState(member_id, {}, None, False)
+        for member_id in [member_id for member_id in self.members if member_id >= num_members]:
+            del self.members[member_id]
+
+    def update_member(self, member_id, answers):
+        return self.members[member_id].update(answers)
+
+    def update_family(self, answers):
+        if answers != self.family_answers:
+            self.family_answers = dict(answers)
+            self.family_dirty = True
+        return self.family_dirty
+
+    def is_complete(self):
+        return all(member.answers for member in self.members.values())
+
+    def submitted_count(self):
+        return sum(1 for member in self.members.values() if member.answers)
+
+    def dirty_members(self):
+        return [member for member in self.ordered_members() if member.dirty]
+
+    def ordered_members(self):
+        return [self.members[member_id] for member_id in sorted(self.members)]
+
+    def summaries(self):
+        summaries = [member.summary for member in self.ordered_members() if member.summary]
+        if self.family_summary:
+            summaries.append(self.family_summary)
+        return summaries
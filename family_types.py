@@ -0,0 +1,67 @@
+FAMILY_TYPES = [
+    {
+        "Document": "Adventurers Family Type",
+        "Family Type Description": """
+        - Strong affinity for immersive nature experiences, preferring to spend their leisure time in the great outdoors.
+        - Enjoys physically engaging activities such as hiking, kayaking, and mountain biking, which are not just hobbies but integral parts of their lifestyle.
+        - Seeks out new adventures, often planning trips that involve exploring unfamiliar terrains, wildlife spotting, and learning survival skills.
+        - Values the educational aspects of travel and nature, teaching children about environmental conservation and biodiversity through hands-on experiences.""",
+        "Mission Examples": [
+            "Visit a national park to explore its vast landscapes and learn about wildlife.",
+            "Participate in a family survival challenge that involves tasks like building a shelter, navigating with a map and compass, and identifying edible plants.",
+            "Go on a bicycle tour that includes planned routes through scenic areas, combining physical activity with sightseeing."
+        ]
+    },
+    {
+        "Document": "Creatives Family Type",
+        "Family Type Description": """
+        - Thrives on artistic expression and creativity, frequently engaging in painting, sculpture, and other visual arts as a family.
+        - Incorporates music deeply into daily life, with family members playing instruments, attending concerts, or exploring various music genres together.
+        - Enjoys DIY projects that transform their living spaces, such as home renovations or garden landscaping, reflecting their creative visions.
+        - Organizes regular arts and crafts sessions that encourage each family member to showcase their artistic talents, often blending education with creativity through these activities.""",
+        "Mission Examples": [
+            "Organize a family painting contest where each member creates artwork based on a common theme.",
+            "Engage in a DIY home decor project, such as redesigning a room or creating handmade decorations.",
+            "Start a family band where each member learns to play an instrument or contributes vocally to create music together."
+        ]
+    },
+    {
+        "Document": "Home-Centered Family Type",
+        "Family Type Description": """
+        - Prefers the comfort and familiarity of home over external activities, creating a cozy and welcoming environment.
+        - Engages in indoor games, movie nights, and storytelling, making their home a hub of family entertainment and relaxation.
+        - Places a strong emphasis on cooking and baking together, using these activities to pass down family recipes and bond over shared meals.
+        - Views their home as a sanctuary for deep conversations, personal growth, and nurturing relationships, often decorating and arranging the living space to support these goals.""",
+        "Mission Examples": [
+            "Host a family cook-off where each member prepares a dish, and everyone gets to taste and rate the dishes.",
+            "Create an indoor mystery game where family members solve puzzles and clues to 'escape' a room or find a hidden treasure.",
+            "Put together a family photo album that captures memorable events and everyday moments, creating a lasting keepsake."
+        ]
+    },
+    {
+        "Document": "Scholars Family Type",
+        "Family Type Description": """
+        - Values intellectual development and academic pursuits, with a home environment that includes a well-stocked library and dedicated study areas.
+        - Participates in educational workshops, museum visits, and science fairs, making learning a fun and regular family outing.
+        - Encourages debate and discussion on a wide range of topics, fostering critical thinking and a love of knowledge in all family members.
+        - Supports continuous education through online courses, tutoring sessions, and a routine that prioritizes study time and intellectual engagement.""",
+        "Mission Examples": [
+            "Conduct experiments using a science kit, exploring different scientific principles and recording the results.",
+            "Challenge the family to a library book loan competition, where each member tries to read and review the most books within a month.",
+            "Visit historical cities and sites to learn about the history and heritage firsthand, making educational travel part of their routine."
+        ]
+    },
+    {
+        "Document": "Active & Healthy Family Type",
+        "Family Type Description": """
+        - Emphasizes a lifestyle centered around health, fitness, and active living, with scheduled times for family workouts and outdoor sports.
+        - Regularly participates in local and community sports events like marathons, cycling races, and fitness challenges.
+        - Maintains a diet focused on nutrition and wellness, often preparing meals together that are healthy and energizing.
+        - Uses physical activity not only as a form of exercise but also as an opportunity for teaching life skills such as teamwork, discipline, and persistence.""",
+        "Mission Examples": [
+            "Start a family fitness challenge that includes daily workouts and tracks progress over a period.",
+            "Organize a weekend sports tournament where family members compete in various sports like soccer, basketball, or swimming.",
+            "Embark on a healthy eating challenge where the family focuses on creating and maintaining a nutritious diet for a month."
+        ]
+    }
+]
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+# OpenAI 호출이 들어가는 작업을 streamlit 스크립트 스레드 밖의 스레드 풀에서 돌립니다.
+# 작업 상태와 결과는 SQLite 에 남기므로, 브라우저를 새로고침해도 같은 작업 키로 진행 상황과 결과를 다시 찾을 수 있습니다.
+# 작업 키(idempotency key)는 기본적으로 (종류, 입력) 해시라서 같은 폼을 두 번 제출해도 호출은 한 번만 나갑니다.
+JOB_DB_PATH = os.getenv('FAIM_JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3'))
+# 프로세스 전체에서 동시에 도는 작업 수입니다. 작업 하나가 내는 동시 호출 수와 곱한 값이 OpenAI 동시 요청 상한이 됩니다.
+MAX_WORKERS = int(os.getenv('FAIM_JOB_WORKERS', '4'))
+JOB_TTL = 24 * 60 * 60
+PROGRESS_INTERVAL = 0.1
+POLL_INTERVAL = 0.1
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobContext:
+    # 핸들러에 같이 넘겨서 중간 결과를 남기고 취소 요청을 확인하게 합니다.
+    def __init__(self, queue, key, cancel_event):
+        self.queue = queue
+        self.key = key
+        self._cancel_event = cancel_event
+        self._progress_at = 0
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def progress(self, value, force=False):
+        now = time.monotonic()
+        if force or now - self._progress_at >= PROGRESS_INTERVAL:
+            self._progress_at = now
+            self.queue._progress(self.key, value, self._cancel_event)
+
+class JobQueue:
+    def __init__(self, path=JOB_DB_PATH, max_workers=MAX_WORKERS, ttl=JOB_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.handlers = {}
+        self.reusable = {}
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='faim-job')
+        self._cancel_events = {}
+        self._resubmitted = set()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    trace_id TEXT,
+                    parent_span_id TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            # parent_span_id 가 없던 때 만든 DB 파일에는 컬럼을 추가합니다.
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if 'parent_span_id' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN parent_span_id TEXT")
+        return self._conn
+
+    def register(self, kind, handler, reusable=None):
+        # reusable(result) 가 False 를 돌려주는 끝난 작업은 같은 키로 다시 제출하면 재사용하지 않고 다시 돌립니다.
+        self.handlers[kind] = handler
+        if reusable is not None:
+            self.reusable[kind] = reusable
+
+    @staticmethod
+    def make_key(kind, payload):
+        data = json.dumps([kind, payload], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def submit(self, kind, payload, key=None):
+        if kind not in self.handlers:
+            raise KeyError(f"no handler registered for job kind {kind!r}")
+        key = key or self.make_key(kind, payload)
+        current = tracing.current_span()
+        parent_span_id = current.span_id if current is not None else None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT status, result FROM jobs WHERE key = ?", (key,)).fetchone()
+            event = self._cancel_events.get(key)
+            if row is not None and row[0] in (QUEUED, RUNNING) and event is not None and event.is_set():
+                # 취소를 요청했지만 아직 끝나지 않은 작업입니다. 그 결과를 돌려주면 안 되므로 끝나는 대로 같은 키로 처음부터 다시 돌립니다.
+                self._resubmitted.add(key)
+                conn.execute(
+                    "UPDATE jobs SET progress = NULL, trace_id = ?, parent_span_id = ? WHERE key = ?",
+                    (tracing.current_trace_id(), parent_span_id, key)
+                )
+                conn.commit()
+                return key
+            # 대기 중이거나 돌고 있거나 끝난 작업이 있으면 새로 만들지 않고 그 키를 돌려줍니다. 실패/취소됐거나 재사용하지 않는 결과만 다시 돌립니다.
+            if row is not None and row[0] not in (FAILED, CANCELLED) and not self._stale(kind, row[0], row[1]):
+                return key
+            conn.execute(
+                """INSERT OR REPLACE INTO jobs (key, kind, status, payload, trace_id, parent_span_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (key, kind, QUEUED, json.dumps(payload, ensure_ascii=False), tracing.current_trace_id(), parent_span_id, now)
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINISHED, now - self.ttl)
+            )
+            conn.commit()
+        self._enqueue(key)
+        return key
+
+    def _stale(self, kind, status, result):
+        reusable = self.reusable.get(kind)
+        return status == DONE and reusable is not None and not reusable(json.loads(result))
+
+    def _enqueue(self, key):
+        cancel_event = self._cancel_events[key] = threading.Event()
+        self._executor.submit(self._run, key, cancel_event)
+
+    def recover(self):
+        # 프로세스가 죽으면서 끝내지 못한 작업을 다시 큐에 넣습니다. 핸들러를 모두 등록한 뒤에 부릅니다.
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key, kind FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        keys = [key for key, kind in rows if kind in self.handlers]
+        for key in keys:
+            self._update(key, status=QUEUED)
+            self._enqueue(key)
+        return len(keys)
+
+    def _update(self, key, **fields):
+        with self._lock:
+            self._write(key, fields)
+
+    def _write(self, key, fields):
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        conn = self._connect()
+        conn.execute(f"UPDATE jobs SET {columns} WHERE key = ?", (*fields.values(), key))
+        conn.commit()
+
+    def _progress(self, key, value, cancel_event):
+        # 취소된 작업은 진행 상황을 더 남기지 않습니다. 같은 키로 다시 제출된 작업의 진행 상황과 섞이지 않게 합니다.
+        with self._lock:
+            if not cancel_event.is_set():
+                self._write(key, {'progress': value})
+
+    def _finish(self, key, cancel_event, **fields):
+        with self._lock:
+            # 같은 키로 다시 제출된 작업의 취소 이벤트를 지우지 않도록 이번 실행의 이벤트일 때만 지웁니다.
+            if self._cancel_events.get(key) is cancel_event:
+                del self._cancel_events[key]
+            if key not in self._resubmitted:
+                self._write(key, fields)
+                return
+            # 취소 중에 다시 제출된 작업은 끝난 상태를 남기지 않고 대기 상태로 되돌려 다시 큐에 넣습니다.
+            self._resubmitted.discard(key)
+            self._write(key, {'status': QUEUED, 'progress': None, 'result': None, 'error': None, 'started_at': None, 'finished_at': None})
+            self._enqueue(key)
+
+    def _run(self, key, cancel_event):
+        with self._lock:
+            kind, payload, trace_id, parent_span_id = self._connect().execute(
+                "SELECT kind, payload, trace_id, parent_span_id FROM jobs WHERE key = ?", (key,)
+            ).fetchone()
+        # 작업을 넣은 rerun span 아래에 작업 span 이 묶이도록 풀 스레드에 trace id 와 부모 span id 를 넘겨줍니다.
+        tracing.set_trace_id(trace_id, parent_span_id)
+        context = JobContext(self, key, cancel_event)
+        # 큐에서 기다리는 동안 취소된 작업은 핸들러를 부르지 않고 끝냅니다.
+        if context.cancelled:
+            self._finish(key, cancel_event, status=CANCELLED, finished_at=time.time())
+            return
+        self._update(key, status=RUNNING, started_at=time.time())
+        try:
+            with tracing.span('job', kind=kind, job_key=key[:12]):
+                result = self.handlers[kind](json.loads(payload), context)
+        except Exception as e:
+            self._finish(key, cancel_event, status=FAILED, error=repr(e), finished_at=time.time())
+        else:
+            self._finish(
+                key,
+                cancel_event,
+                status=CANCELLED if context.cancelled else DONE,
+                result=json.dumps(result, ensure_ascii=False),
+                finished_at=time.time()
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT kind, status, progress, result, error, created_at, started_at, finished_at FROM jobs WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        kind, status, progress, result, error, created_at, started_at, finished_at = row
+        return {
+            'key': key,
+            'kind': kind,
+            'status': status,
+            'progress': progress,
+            'result': json.loads(result) if result is not None else None,
+            'error': error,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at,
+        }
+
+    def cancel(self, key):
+        with self._lock:
+            self._resubmitted.discard(key)
+            event = self._cancel_events.get(key)
+            if event is not None:
+                event.set()
+
+    def wait(self, key, timeout=None, interval=POLL_INTERVAL):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(key)
+            if job is None or job['status'] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(interval)
+
+    def run(self, kind, payload, key=None, timeout=None):
+        return self.wait(self.submit(kind, payload, key), timeout)
+
+    def stream_progress(self, key, interval=POLL_INTERVAL):
+        # 작업이 남긴 중간 텍스트에서 새로 늘어난 부분만 내보냅니다. st.write_stream 에 그대로 넘길 수 있습니다.
+        sent = 0
+        while True:
+            job = self.get(key)
+            if job is None:
+                return
+            text = job['progress'] or ""
+            if len(text) > sent:
+                yield text[sent:]
+                sent = len(text)
+            if job['status'] in FINISHED:
+                return
+            time.sleep(interval)
+
+    def stats(self):
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, *FINISHED)}
+        counts.update(dict(rows))
+        return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+if __name__ == '__main__':
+    queue = JobQueue()
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        with queue._lock:
+            conn = queue._connect()
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?, ?)", FINISHED)
+            conn.commit()
+    print(queue.stats())
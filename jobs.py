@@ -0,0 +1,77 @@
+import tracing
+from extractor import extract_family_info
+from job_queue import JobQueue
+from mission import MissionStream
+from mission_store import mission_store
+from summarizer import summarize_family
+
+# job_queue 에 올리는 작업 종류입니다. 입력과 결과는 SQLite 에 JSON 으로 저장되므로 둘 다 JSON 으로 바꿀 수 있어야 합니다.
+
+def summarize_job(payload, context):
+    summaries, usages, latency = summarize_family(payload['members'], payload.get('family'))
+    return {'summaries': summaries, 'usages': usages, 'latency': latency}
+
+def make_classify_job(backend, classifier):
+    def classify_job(payload, context):
+        extracted, usage = extract_family_info(payload['summaries'])
+        family_vector = backend.embed([extracted['Summarization']])[0]
+        with tracing.span('classify', backend=backend.name):
+            ranking = classifier.classify(family_vector)[0]
+        return {'summaries': payload['summaries'], 'extracted': extracted, 'usage': usage, 'ranking': ranking}
+    return classify_job
+
+def reusable_classification(result):
+    # 요청이 몰려 대체 모델로 추출한 결과는 그 자리에서만 쓰고, 같은 가족을 다시 제출하면 원래 모델로 다시 추출합니다.
+    return not result['usage'].get('fallback_from')
+
+def mission_result(mission_stream):
+    return {
+        'text': mission_stream.text,
+        'prompt_tokens': mission_stream.prompt_tokens,
+        'time_to_first_token': mission_stream.time_to_first_token,
+        'latency': mission_stream.latency,
+        'cancelled': mission_stream.cancelled,
+        'reused': None,
+    }
+
+def make_mission_job(backend, store):
+    def mission_job(payload, context):
+        # 가족 요약과 요청사항을 같은 백엔드로 임베딩해서, 비슷한 가족에게 만든 미션이 있으면 그대로 돌려줍니다.
+        additional_needs = payload.get('additional_needs') or ""
+        with tracing.span('mission_store.lookup', family_type=payload['family_type']) as span:
+            family_vector, needs_vector = backend.embed(["\n".join(payload['summaries']), additional_needs or "-"])
+            stored = store.lookup(backend.name, payload['family_type'], family_vector, additional_needs, needs_vector)
+            span.set(hit=stored is not None)
+        if stored is not None:
+            context.progress(stored['mission'], force=True)
+            return {
+                'text': stored['mission'],
+                'prompt_tokens': payload.get('prompt_tokens'),
+                'time_to_first_token': None,
+                'latency': None,
+                'cancelled': False,
+                'reused': stored,
+            }
+
+        mission_stream = MissionStream(payload['system_prompt'], payload['user_content'], payload.get('prompt_tokens'))
+        # 저장소를 찾는 동안 새 요청사항이 들어와 취소됐으면 GPT-4 요청을 열지 않습니다.
+        if context.cancelled:
+            mission_stream.cancelled = True
+            return mission_result(mission_stream)
+        for _ in mission_stream:
+            if context.cancelled:
+                mission_stream.cancel()
+            context.progress(mission_stream.text)
+        context.progress(mission_stream.text, force=True)
+        if not mission_stream.cancelled and mission_stream.text:
+            store.add(backend.name, payload['family_type'], family_vector, additional_needs, needs_vector, mission_stream.text)
+        return mission_result(mission_stream)
+    return mission_job
+
+def make_job_queue(backend, classifier, store=mission_store, **kwargs):
+    queue = JobQueue(**kwargs)
+    queue.register('summarize', summarize_job)
+    queue.register('classify', make_classify_job(backend, classifier), reusable=reusable_classification)
+    queue.register('mission', make_mission_job(backend, store))
+    queue.recover()
+    return queue
@@ -0,0 +1,249 @@
+from openai import OpenAI, AsyncOpenAI, RateLimitError, InternalServerError, APITimeoutError, APIConnectionError
+from dotenv import load_dotenv
+import asyncio
+import os
+import random
+import time
+
+import tracing
+from prompt_builder import count_tokens, count_message_tokens
+from rate_limiter import scheduler
+from response_cache import response_cache
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# 재시도는 request/arequest 에서 직접 해서 횟수를 span 에 남기므로 SDK 재시도는 끕니다.
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_BATCH_SIZE = 256
+
+MAX_CONCURRENT_CALLS = 8
+CALL_TIMEOUT = 30
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 0.5
+# 429와 5xx, 타임아웃/연결 오류만 재시도합니다. 4xx는 다시 보내도 똑같이 실패합니다.
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APITimeoutError, APIConnectionError, asyncio.TimeoutError)
+# 토큰 버킷에서 미리 빼 둘 출력 토큰 추정치입니다. 응답이 오면 실제 사용량으로 맞춥니다.
+COMPLETION_TOKEN_ESTIMATE = 512
+
+def retry_delay(attempt, base_delay=RETRY_BASE_DELAY):
+    # full jitter: 동시에 429를 맞은 호출들이 같은 시점에 다시 몰리지 않도록 합니다.
+    return random.uniform(0, base_delay * 2 ** attempt)
+
+def estimate_chat_tokens(system_prompt, user_content, params):
+    return count_message_tokens(system_prompt, user_content) + (params.get('max_tokens') or COMPLETION_TOKEN_ESTIMATE)
+
+def record_rate_limit_wait(waited, span=None):
+    # current 로 잡히지 않은 span(미션 스트림처럼 직접 열고 닫는 span)은 호출한 쪽에서 넘겨줍니다.
+    span = span or tracing.current_span()
+    if span is not None:
+        span.set(rate_limit_wait_ms=1000 * waited)
+
+def handle_response(model, raw_response, tokens):
+    # make_request 는 with_raw_response 로 보내서 rate limit 헤더를 스케줄러에 넘기고 파싱한 응답을 돌려줍니다.
+    scheduler.observe(model, raw_response.headers)
+    response = raw_response.parse()
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        scheduler.settle(model, tokens, usage.total_tokens)
+    return response
+
+def handle_retryable_error(model, error, attempt):
+    # 429 는 스케줄러가 retry-after 동안 이 모델을 막아두므로 따로 쉬지 않고, 나머지 오류만 backoff 합니다.
+    if isinstance(error, RateLimitError):
+        scheduler.penalize(model, error.response.headers)
+        return 0
+    return retry_delay(attempt)
+
+def send(model, make_request, tokens):
+    try:
+        return make_request()
+    except BaseException:
+        # 실패한 시도는 한도를 쓰지 않은 것으로 보고 버킷에서 미리 뺀 토큰을 돌려줍니다.
+        # 그러지 않으면 429 가 몰릴 때 재시도마다 토큰이 빠져서 버킷이 실제 한도보다 작아집니다.
+        scheduler.settle(model, tokens, 0)
+        raise
+
+async def asend(model, make_request, tokens, timeout):
+    try:
+        return await asyncio.wait_for(make_request(), timeout)
+    except BaseException:
+        scheduler.settle(model, tokens, 0)
+        raise
+
+def request(make_request, model, tokens=0, max_retries=MAX_RETRIES, span=None):
+    waited = 0
+    try:
+        for attempt in range(max_retries + 1):
+            waited += scheduler.acquire(model, tokens)
+            try:
+                return handle_response(model, send(model, make_request, tokens), tokens), attempt
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                time.sleep(handle_retryable_error(model, e, attempt))
+    finally:
+        record_rate_limit_wait(waited, span)
+
+def get_embedding(text, model=EMBEDDING_MODEL, use_cache=True):
+    return get_embeddings([text], model=model, use_cache=use_cache)[0]
+
+def get_embeddings(texts, model=EMBEDDING_MODEL, use_cache=True):
+    with tracing.span('embedding', model=model, texts=len(texts)) as span:
+        texts = [text.replace("\n", " ") for text in texts]
+        keys = [response_cache.make_key('embedding', model, None, text) for text in texts]
+        embeddings = [response_cache.get(key) if use_cache else None for key in keys]
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        retries = 0
+        prompt_tokens = 0
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            response, attempt = request(
+                lambda: client.embeddings.with_raw_response.create(input=[texts[i] for i in batch], model=model, timeout=CALL_TIMEOUT),
+                model,
+                sum(count_tokens(texts[i]) for i in batch)
+            )
+            retries += attempt
+            prompt_tokens += response.usage.prompt_tokens
+            for i, item in zip(batch, sorted(response.data, key=lambda item: item.index)):
+                embeddings[i] = item.embedding
+                response_cache.set(keys[i], item.embedding)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=0, retries=retries, cached=not missing, cached_texts=len(texts) - len(missing))
+        return embeddings
+
+def cached_usage(usage, start):
+    usage = dict(usage)
+    usage['latency'] = time.perf_counter() - start
+    usage['retries'] = 0
+    usage['cached'] = True
+    return usage
+
+def is_chat_cached(model, system_prompt, user_content, **params):
+    return response_cache.contains(response_cache.make_key('chat', model, system_prompt, user_content, params))
+
+def chat_completion(model, system_prompt, user_content, use_cache=True, **params):
+    with tracing.span('chat_completion', model=model) as span:
+        start = time.perf_counter()
+        key = response_cache.make_key('chat', model, system_prompt, user_content, params)
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                usage = cached_usage(cached['usage'], start)
+                tracing.record_usage(span, usage)
+                return cached['content'], usage
+
+        response, attempt = request(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {'role': 'system', 'content': system_prompt},
+                    {'role': 'user', 'content': user_content}
+                ],
+                timeout=CALL_TIMEOUT,
+                **params
+            ),
+            model,
+            estimate_chat_tokens(system_prompt, user_content, params)
+        )
+        usage = {
+            'model': response.model,
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+            'latency': time.perf_counter() - start,
+            'retries': attempt,
+            'cached': False,
+        }
+        tracing.record_usage(span, usage)
+        content = response.choices[0].message.content
+        response_cache.set(key, {'content': content, 'usage': usage})
+        return content, usage
+
+def make_async_client():
+    # httpx 커넥션 풀이 이벤트 루프에 묶이므로 asyncio.run 마다 새로 만들어 씁니다.
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+async def arequest(semaphore, make_request, model, tokens=0, timeout=CALL_TIMEOUT, max_retries=MAX_RETRIES):
+    waited = 0
+    try:
+        for attempt in range(max_retries + 1):
+            # 스케줄러에서 기다리는 동안 semaphore 자리를 잡고 있지 않도록 먼저 통과시킵니다.
+            waited += await scheduler.aacquire(model, tokens)
+            try:
+                async with semaphore:
+                    return handle_response(model, await asend(model, make_request, tokens, timeout), tokens), attempt
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                await asyncio.sleep(handle_retryable_error(model, e, attempt))
+    finally:
+        record_rate_limit_wait(waited)
+
+async def achat_completion(aclient, semaphore, model, system_prompt, user_content, timeout=CALL_TIMEOUT, max_retries=MAX_RETRIES, use_cache=True, **params):
+    with tracing.span('chat_completion', model=model) as span:
+        start = time.perf_counter()
+        key = response_cache.make_key('chat', model, system_prompt, user_content, params)
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                usage = cached_usage(cached['usage'], start)
+                tracing.record_usage(span, usage)
+                return cached['content'], usage
+
+        response, attempt = await arequest(
+            semaphore,
+            lambda: aclient.chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {'role': 'system', 'content': system_prompt},
+                    {'role': 'user', 'content': user_content}
+                ],
+                **params
+            ),
+            model,
+            estimate_chat_tokens(system_prompt, user_content, params),
+            timeout,
+            max_retries
+        )
+
+        usage = {
+            'model': response.model,
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+            'latency': time.perf_counter() - start,
+            'retries': attempt,
+            'cached': False,
+        }
+        tracing.record_usage(span, usage)
+        content = response.choices[0].message.content
+        response_cache.set(key, {'content': content, 'usage': usage})
+        return content, usage
+
+async def aget_embeddings(aclient, semaphore, texts, model=EMBEDDING_MODEL, timeout=CALL_TIMEOUT, max_retries=MAX_RETRIES, use_cache=True):
+    with tracing.span('embedding', model=model, texts=len(texts)) as span:
+        texts = [text.replace("\n", " ") for text in texts]
+        keys = [response_cache.make_key('embedding', model, None, text) for text in texts]
+        embeddings = [response_cache.get(key) if use_cache else None for key in keys]
+
+        # 캐시에 없는 텍스트만 모아서 요청 하나에 여러 개씩 보냅니다.
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        retries = 0
+        prompt_tokens = 0
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            response, attempt = await arequest(
+                semaphore,
+                lambda: aclient.embeddings.with_raw_response.create(input=[texts[i] for i in batch], model=model),
+                model,
+                sum(count_tokens(texts[i]) for i in batch),
+                timeout,
+                max_retries
+            )
+            retries += attempt
+            prompt_tokens += response.usage.prompt_tokens
+            for i, item in zip(batch, sorted(response.data, key=lambda item: item.index)):
+                embeddings[i] = item.embedding
+                response_cache.set(keys[i], item.embedding)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=0, retries=retries, cached=not missing, cached_texts=len(texts) - len(missing))
+        return embeddings
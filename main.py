@@ -1,385 +1,253 @@
-from openai import OpenAI
 import streamlit as st
-import numpy as np
-import json
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-MEMBER_SUMMARIZER_PROMPT = "You are a chatbot that summarizes information about specific family members. As input, information about specific family members will be presented to you. Include all relevant information and summarize the input into 2 sentences. Be sure to include all user input. Although input will be in Korean, your answer should be in **English**."
-
-INFORMATION_EXTRACTOR_PROMPT = """You will need to help classify the family into which type they fall based on information about family members and their responses to the family questionnaire. I would like to divide families into the follwing five types:
-###
-TYPE1
-Adventurers Family:
-This family type is passionate about nature and outdoor activities and is open to new experiences. Members of the Adventurers family love exploring, engaging in physical activities, and seeking adventures that bring them closer to nature.
-
-TYPE2
-Creatives Family:
-The Creatives family type has a strong interest in artistic expression and creative activities. These families enjoy arts and crafts, music, and DIY projects that allow them to express their creativity and work together on aesthetically pleasing projects.
-
-TYPE3
-Home-Centered Family:
-Home-Centered families prefer spending quality time at home. They enjoy activities that can be done together in the comfort of their own home, focusing on bonding and creating memories without the need to venture outside.
-
-TYPE4
-Scholars Family:
-The Scholars family is deeply interested in learning and expanding their knowledge. These families value educational activities that stimulate intellectual growth and promote a love of learning among all family members.
-
-TYPE5
-Active & Healthy Family:
-Families in the Active & Healthy category prioritize maintaining health and fitness and have an interest in sports. These families engage in activities that promote physical health and well-being, ensuring that all family members stay active and healthy together.
-###
-Extract the information corresponding to each family category from the input provided. When extracting information, be careful not to focus on certain category. Then, using the extracted information, create a summarization of each family's characteristics. Your summarization should include all the extracted information and be presented in the form of a JSON object with the following format:
-{'Extracted_info': 'Information extracted from the input.', 'Summarization': 'Summarization of the input based on the extracted information.'}
-
-Please ensure that your summarization accurately captures the key characteristics of each family type based on the extracted information, providing a clear and comprehensive overview of each family category. Your response should be flexible enough to allow for various relevant and creative summarizations. Also your response should **strictly** follow the JSON format I instructed. 
-"""
-
-FAMILY_SUMMARIZER_PROMPT = "You are a chatbot that summarizes information about specific family. As input, information about specific family will be presented to you. Include all relevant information and summarize the input into 2 sentences. Be sure to include all user input. Although input will be in Korean, your answer should be in **English**."
-
-MISSION_GENERATOR_PROMPT = """
-As a family mission chatbot, your primary task is to generate two engaging and achievable missions tailored to the unique qualities and interests of each family member. You will be provided with a summary of each family member's details, information about the family type, characteristics associated with that family type, and additional requests from the family. The missions should be designed for family participation and should be completable within 30 minutes. Emphasize collaboration and interaction among family members to foster a sense of unity and fun within the family dynamic. Your response should be flexible to accommodate diverse family types and characteristics, aligning with their specific needs and preferences. Your answer should be **in Korean**.
-"""
-
-def get_embedding(text, model="text-embedding-ada-002"):
-    text = text.replace("\n", " ")
-    return client.embeddings.create(input = [text], model=model).data[0].embedding
-
-def cossim(vector_a, vector_b):
-    dot_product = np.dot(vector_a, vector_b)
-    norm_a = np.linalg.norm(vector_a)
-    norm_b = np.linalg.norm(vector_b)
-    if norm_a == 0 or norm_b == 0:
-        return 0
-    else:
-        similarity = dot_product / (norm_a * norm_b)
-        return similarity
-
-if 'initialize' not in st.session_state:
-    st.session_state.initialize = False
-
-if 'type_vector' not in st.session_state:
-    st.session_state.type_vector = []
-    
-if 'family_type' not in st.session_state:
-    st.session_state.family_type = []
-
-option = st.sidebar.selectbox(
-    "어떤 기능을 이용하시겠습니까?",
-    ['가족 유형 검사', '가족 미션 추출']
-)
+import tracing
+from embedding_backends import DEFAULT_BACKEND, get_backend
+from type_index import load_or_build_type_index
+from classifier import TypeClassifier
+from prompt_builder import build_mission_prompt
+from questionnaire import format_member_information, format_family_information, ROLE_OPTIONS, MEMBER_QUESTIONS, default_role_index
+from family_state import FamilyState
+from job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING
+from jobs import make_job_queue
+from mission_store import mission_store
+from response_cache import response_cache
+
+# 가족 유형 임베딩은 프로세스당 한 번만 디스크에서 불러옵니다. (인덱스가 없으면 한 번 빌드)
+@st.cache_resource
+def load_classifier(backend_name=DEFAULT_BACKEND):
+    backend = get_backend(backend_name)
+    return backend, TypeClassifier(load_or_build_type_index(backend), backend.temperature)
+
+# OpenAI 호출은 모두 프로세스에 하나뿐인 작업 큐에서 돌고, 스크립트는 작업 키로 상태와 결과만 확인합니다.
+@st.cache_resource
+def load_job_queue(backend_name=DEFAULT_BACKEND):
+    return make_job_queue(*load_classifier(backend_name))
+
+job_queue = load_job_queue()
+
+def apply_classification(result):
+    st.session_state.classification = result
+    st.session_state.member_info = result['summaries']
+    st.session_state.family_type = [result['ranking'][0]]
 
 def initialize():
     st.session_state.initialize = True
 
-if option == '가족 유형 검사':
+# 세션마다 trace id 하나를 두고, 이번 rerun 에서 나온 span 들을 모두 'streamlit.rerun' span 아래에 묶습니다.
+# streamlit 이 rerun 을 예외로 끊어도 span 이 닫혀서 기록되도록 스크립트 본문 전체를 감쌉니다.
+if 'trace_id' not in st.session_state:
+    st.session_state.trace_id = tracing.new_id(16)
+tracing.set_trace_id(st.session_state.trace_id)
+
+with tracing.span('streamlit.rerun'):
+    if 'initialize' not in st.session_state:
+        st.session_state.initialize = False
+
+    if 'family_type' not in st.session_state:
+        st.session_state.family_type = []
+
+    if 'classification' not in st.session_state:
+        st.session_state.classification = None
+
+    # 작업 키를 URL 에 남겨두므로 새로고침으로 세션이 새로 만들어져도 분류 결과와 미션을 다시 불러옵니다.
+    if st.session_state.classification is None and 'classify_job' in st.query_params:
+        with st.spinner("이전에 요청한 가족 유형 분석 결과를 불러오는 중이에요!"):
+            classify_job = job_queue.wait(st.query_params['classify_job'])
+        if classify_job is not None and classify_job['status'] == DONE:
+            apply_classification(classify_job['result'])
+
+    option = st.sidebar.selectbox(
+        "어떤 기능을 이용하시겠습니까?",
+        ['가족 유형 검사', '가족 미션 추출']
+    )
+
+    cache_stats = response_cache.stats()
+    st.sidebar.caption(f"응답 캐시 : 적중 {cache_stats['hits']} / 미스 {cache_stats['misses']} (적중률 {cache_stats['hit_rate']:.0%}), 저장 {cache_stats['entries']}건")
+    mission_stats = mission_store.stats()
+    st.sidebar.caption(f"미션 재사용 : 적중 {mission_stats['hits']} / 미스 {mission_stats['misses']} (적중률 {mission_stats['hit_rate']:.0%}), 저장 {mission_stats['entries']}건")
+    job_stats = job_queue.stats()
+    st.sidebar.caption(f"작업 큐 : 대기 {job_stats[QUEUED]} / 실행 중 {job_stats[RUNNING]}")
+
+    if option == '가족 유형 검사':
+
+        st.button("분석 시작", on_click=initialize)
+
+        if st.session_state.initialize:
+
+            num_members = st.slider(
+                "가족이 몇명으로 구성되나요?",
+                min_value=1,
+                max_value=7,
+                value=3,
+                step=1,
+            )
 
-    button = st.button("분석 시작", on_click=initialize)
-    if button:
-        json_family_type = [
-            {
-                "Document": "Adventurers Family Type",
-                "Family Type Description": """
-                - Strong affinity for immersive nature experiences, preferring to spend their leisure time in the great outdoors.
-                - Enjoys physically engaging activities such as hiking, kayaking, and mountain biking, which are not just hobbies but integral parts of their lifestyle.
-                - Seeks out new adventures, often planning trips that involve exploring unfamiliar terrains, wildlife spotting, and learning survival skills.
-                - Values the educational aspects of travel and nature, teaching children about environmental conservation and biodiversity through hands-on experiences.""",
-                "Mission Examples": [
-                    "Visit a national park to explore its vast landscapes and learn about wildlife.",
-                    "Participate in a family survival challenge that involves tasks like building a shelter, navigating with a map and compass, and identifying edible plants.",
-                    "Go on a bicycle tour that includes planned routes through scenic areas, combining physical activity with sightseeing."
-                ]
-            },
-            {
-                "Document": "Creatives Family Type",
-                "Family Type Description": """
-                - Thrives on artistic expression and creativity, frequently engaging in painting, sculpture, and other visual arts as a family.
-                - Incorporates music deeply into daily life, with family members playing instruments, attending concerts, or exploring various music genres together.
-                - Enjoys DIY projects that transform their living spaces, such as home renovations or garden landscaping, reflecting their creative visions.
-                - Organizes regular arts and crafts sessions that encourage each family member to showcase their artistic talents, often blending education with creativity through these activities.""",
-                "Mission Examples": [
-                    "Organize a family painting contest where each member creates artwork based on a common theme.",
-                    "Engage in a DIY home decor project, such as redesigning a room or creating handmade decorations.",
-                    "Start a family band where each member learns to play an instrument or contributes vocally to create music together."
-                ]
-            },
-            {
-                "Document": "Home-Centered Family Type",
-                "Family Type Description": """
-                - Prefers the comfort and familiarity of home over external activities, creating a cozy and welcoming environment.
-                - Engages in indoor games, movie nights, and storytelling, making their home a hub of family entertainment and relaxation.
-                - Places a strong emphasis on cooking and baking together, using these activities to pass down family recipes and bond over shared meals.
-                - Views their home as a sanctuary for deep conversations, personal growth, and nurturing relationships, often decorating and arranging the living space to support these goals.""",
-                "Mission Examples": [
-                    "Host a family cook-off where each member prepares a dish, and everyone gets to taste and rate the dishes.",
-                    "Create an indoor mystery game where family members solve puzzles and clues to 'escape' a room or find a hidden treasure.",
-                    "Put together a family photo album that captures memorable events and everyday moments, creating a lasting keepsake."
-                ]
-            },
-            {
-                "Document": "Scholars Family Type",
-                "Family Type Description": """
-                - Values intellectual development and academic pursuits, with a home environment that includes a well-stocked library and dedicated study areas.
-                - Participates in educational workshops, museum visits, and science fairs, making learning a fun and regular family outing.
-                - Encourages debate and discussion on a wide range of topics, fostering critical thinking and a love of knowledge in all family members.
-                - Supports continuous education through online courses, tutoring sessions, and a routine that prioritizes study time and intellectual engagement.""",
-                "Mission Examples": [
-                    "Conduct experiments using a science kit, exploring different scientific principles and recording the results.",
-                    "Challenge the family to a library book loan competition, where each member tries to read and review the most books within a month.",
-                    "Visit historical cities and sites to learn about the history and heritage firsthand, making educational travel part of their routine."
-                ]
-            },
-            {
-                "Document": "Active & Healthy Family Type",
-                "Family Type Description": """
-                - Emphasizes a lifestyle centered around health, fitness, and active living, with scheduled times for family workouts and outdoor sports.
-                - Regularly participates in local and community sports events like marathons, cycling races, and fitness challenges.
-                - Maintains a diet focused on nutrition and wellness, often preparing meals together that are healthy and energizing.
-                - Uses physical activity not only as a form of exercise but also as an opportunity for teaching life skills such as teamwork, discipline, and persistence.""",
-                "Mission Examples": [
-                    "Start a family fitness challenge that includes daily workouts and tracks progress over a period.",
-                    "Organize a weekend sports tournament where family members compete in various sports like soccer, basketball, or swimming.",
-                    "Embark on a healthy eating challenge where the family focuses on creating and maintaining a nutritious diet for a month."
-                ]
-            }
-        ]
-
-        type_description_list = []
-        for i in range(len(json_family_type)):
-            type_description_list.append(json_family_type[i]['Family Type Description'].lower())
-            
-        for i in range(len(json_family_type)):
-            st.session_state.type_vector.append({})
-            st.session_state.type_vector[i]['family type'] = json_family_type[i]['Document']
-            st.session_state.type_vector[i]['type description'] = json_family_type[i]['Family Type Description'].strip()
-            st.session_state.type_vector[i]['embedded vector'] = get_embedding(json_family_type[i]['Family Type Description'])
-            
-    if st.session_state.initialize:
-
-        num_members = st.slider(
-            "가족이 몇명으로 구성되나요?",
-            min_value=1,
-            max_value=7,
-            value=3,
-            step=1,
-        )
-
-        if "members_count" not in st.session_state:
-            st.session_state.members_count = 0
-        if "member_info" not in st.session_state:
-            st.session_state.member_info = []
-        if "extracted_family_info" not in st.session_state:
-            st.session_state.extracted_family_info = []
-
-        with st.form(key="Dad_information"):
-            Dad_name = st.text_input("아빠의 이름은 무엇인가요?")
-            Dad_age = st.number_input("아빠의 나이가 어떻게 되나요?")
-            Dad_hobby = st.text_input("아빠의 취미는 무엇인가요?")
-            Dad_job = st.text_input("아빠의 직업이 어떻게 되시나요?")
-            Dad_weekend = st.text_input("아빠는 주말에 주로 뭘 하나요?")
-            submit_button = st.form_submit_button(label='제출')
-
-        if submit_button:
-            dad_information = f"""
-            Role in family : Dad,
-            Dad's age : {Dad_age},
-            Dad's hobby : {Dad_hobby},
-            Dad's job : {Dad_job},
-            Dad's weekend : {Dad_weekend}
-            """
-
-            summary = client.chat.completions.create(
-                model='gpt-3.5-turbo-0125',
-                messages=[
-                    {'role': 'system', 'content': MEMBER_SUMMARIZER_PROMPT},
-                    {'role': 'user', 'content': dad_information}
-                ]
-            ).choices[0].message.content
-            
-            st.session_state.member_info.append(summary)
-            
-            st.session_state.members_count += 1
-
-        with st.form(key="mom_information"):
-            mom_name = st.text_input("엄마의 이름은 무엇인가요?")
-            mom_age = st.number_input("엄마의 나이가 어떻게 되나요?")
-            mom_hobby = st.text_input("엄마의 취미는 무엇인가요?")
-            mom_job = st.text_input("엄마의 직업이 어떻게 되시나요?")
-            mom_weekend = st.text_input("엄마는 주말에 주로 뭘 하나요?")
-            submit_button = st.form_submit_button(label='제출')
-
-        if submit_button:
-            mom_information = f"""
-            Mom's name : {mom_name},
-            Mom's age : {mom_age},
-            Mom's hobby : {mom_hobby},
-            Mom's job : {mom_job},
-            Mom's weekend : {mom_weekend}
-            """
-
-            summary = client.chat.completions.create(
-                model='gpt-3.5-turbo-0125',
-                messages=[
-                    {'role': 'system', 'content': MEMBER_SUMMARIZER_PROMPT},
-                    {'role': 'user', 'content': mom_information}
-                ]
-            ).choices[0].message.content
-            
-            st.session_state.member_info.append(summary)
-            st.session_state.members_count += 1
-
-        with st.form(key="child1_information"):
-            child_name = st.text_input("자식의 이름은 무엇인가요?")
-            child_sex = st.text_input("자식의 성별은 무엇인가요?")
-            child_age = st.number_input("자식의 나이가 어떻게 되나요?")
-            child_hobby = st.text_input("자식의 취미는 무엇인가요?")
-            child_job = st.text_input("자식의 직업이 어떻게 되시나요?")
-            child_weekend = st.text_input("자식은 주말에 주로 뭘 하나요?")
-            submit_button = st.form_submit_button(label='제출')
-
-        if submit_button:
-            child_information = f"""
-            child's name : {child_name},
-            child's age : {child_age},
-            child's hobby : {child_hobby},
-            child's job : {child_job},
-            child's weekend : {child_weekend}
-            """
-
-            summary = client.chat.completions.create(
-                model='gpt-3.5-turbo-0125',
-                messages=[
-                    {'role': 'system', 'content': MEMBER_SUMMARIZER_PROMPT},
-                    {'role': 'user', 'content': child_information}
-                ]
-            ).choices[0].message.content
-            
-            st.session_state.member_info.append(summary)
-            st.session_state.members_count += 1
-
-            
-        with st.form(key="child2_information"):
-            child_name = st.text_input("자식의 이름은 무엇인가요?")
-            child_sex = st.text_input("자식의 성별은 무엇인가요?")
-            child_age = st.number_input("자식의 나이가 어떻게 되나요?")
-            child_hobby = st.text_input("자식의 취미는 무엇인가요?")
-            child_job = st.text_input("자식의 직업이 어떻게 되시나요?")
-            child_weekend = st.text_input("자식은 주말에 주로 뭘 하나요?")
-            submit_button = st.form_submit_button(label='제출')
-
-        if submit_button:
-            child_information = f"""
-            child's name : {child_name},
-            child's age : {child_age},
-            child's hobby : {child_hobby},
-            child's job : {child_job},
-            child's weekend : {child_weekend}
-            """
-
-            summary = client.chat.completions.create(
-                model='gpt-3.5-turbo-0125',
-                messages=[
-                    {'role': 'system', 'content': MEMBER_SUMMARIZER_PROMPT},
-                    {'role': 'user', 'content': child_information}
-                ]
-            ).choices[0].message.content
-            
-            st.session_state.member_info.append(summary)
-            st.session_state.members_count += 1
-
-
-        with st.form(key='Family information'):
-            important_family_activity = st.text_input("가족이 함께하는 활동에서 가장 중요하게 생각하는 것은 무엇인가요?")
-            time_spent_together = st.text_input("1주일에 가족끼리 함께 보내는 시간이 얼마 정도 되나요?")
-            desired_activity = st.text_input("가족끼리 새롭게 하고 싶은 활동은 무엇인가요?")
-            submit_button = st.form_submit_button(label='제출')
-
-        if submit_button:
-            family_information = f"""
-            Important family activity : {important_family_activity},
-            Time spent together : {time_spent_together},
-            Desired activity : {desired_activity}
-            """
-            summary = client.chat.completions.create(
-                model='gpt-3.5-turbo-0125',
-                messages=[
-                    {'role': 'system', 'content': FAMILY_SUMMARIZER_PROMPT},
-                    {'role': 'user', 'content': family_information}
-                ]
-            ).choices[0].message.content
-            
-            st.session_state.member_info.append(summary)
-
-        start_analyzing = st.button("가족 유형 확인")
-
-        if start_analyzing:
-            if st.session_state.members_count == num_members:
-                st.spinner("가족 유형을 분석 중이에요! 조금만 기다려주세요!")
-                info_convolution = ""
-                for message in st.session_state.member_info:
-                    info_convolution += message + "\n"
-                    extracted_summarized_info = client.chat.completions.create(
-                        model='gpt-4-turbo-preview',
-                        messages=[
-                            {'role': 'system', 'content': INFORMATION_EXTRACTOR_PROMPT},
-                            {'role': 'user', 'content': info_convolution}
-                        ],  
-                    response_format={'type': 'json_object'}
-                    ).choices[0].message.content
-
-                extracted_summarized_info = json.loads(extracted_summarized_info)
-                family_vector = get_embedding(extracted_summarized_info['Summarization'])
-                
-                max_similarity = 0
-                best_vector = None
-
-                for vector in st.session_state.type_vector:
-                    similarity = 100 * cossim(vector['embedded vector'], family_vector).round(4)
-                    
-                    st.markdown(f"{vector['family type']} 점수 : {similarity}")
-                    # 지금 데모에서는 출력값을 코사인 유사도를 기준으로 하니까 너무 값이 다 높아요.. 그래서 그냥 logprob으로 구조를 갈아야할 것 같은데 지금 당장 하기엔 시간이 너무 오래 걸릴 것 같아서 일단 이대로 했습니다..!!
-                    
-                    if similarity > max_similarity:
-                        max_similarity = similarity
-                        best_vector = vector
-
-                if best_vector:
-                    st.markdown(f"가장 높은 유사도를 가진 가족 유형: {best_vector['family type']} 점수 : {max_similarity}")
-                    
-                    st.session_state.family_type.append(best_vector)
-            else:
-                st.markdown('가족 정보를 마저 입력해주세요~!')
-
-if option == "가족 미션 추출":
-    if st.session_state.family_type != []:
-        family_type = st.session_state.family_type[0]
-        st.header(f"FAMILY TYPE: {family_type['family type']}")
-        
-        Additional_needs = st.chat_input('미션 생성에서 추가적으로 고려됐으면 하는 사항이 무엇인가요?')
+            if "member_info" not in st.session_state:
+                st.session_state.member_info = []
+            # 폼 제출 시에는 답변만 저장하고, 요약은 '가족 유형 확인' 때 바뀐 구성원만 한꺼번에 동시 요청합니다.
+            if "family_state" not in st.session_state:
+                st.session_state.family_state = FamilyState.empty()
+            family_state = st.session_state.family_state
+            family_state.resize(num_members)
+
+            role_labels = [label for label, _ in ROLE_OPTIONS]
+            for member in family_state.ordered_members():
+                with st.form(key=f"member_{member.member_id}_information"):
+                    st.markdown(f"**가족 구성원 {member.member_id + 1}**")
+                    role_label = st.selectbox(
+                        "가족 내 역할이 무엇인가요?",
+                        role_labels,
+                        index=default_role_index(member.member_id),
+                        key=f"member_{member.member_id}_role"
+                    )
+                    answers = {'role': dict(ROLE_OPTIONS)[role_label]}
+                    for question_field, question in MEMBER_QUESTIONS:
+                        widget_key = f"member_{member.member_id}_{question_field}"
+                        if question_field == 'age':
+                            answers[question_field] = st.number_input(question, min_value=0, step=1, key=widget_key)
+                        else:
+                            answers[question_field] = st.text_input(question, key=widget_key)
+                    submit_button = st.form_submit_button(label='제출')
+
+                if submit_button:
+                    family_state.update_member(member.member_id, answers)
+
+            with st.form(key='Family information'):
+                important_family_activity = st.text_input("가족이 함께하는 활동에서 가장 중요하게 생각하는 것은 무엇인가요?")
+                time_spent_together = st.text_input("1주일에 가족끼리 함께 보내는 시간이 얼마 정도 되나요?")
+                desired_activity = st.text_input("가족끼리 새롭게 하고 싶은 활동은 무엇인가요?")
+                submit_button = st.form_submit_button(label='제출')
+
+            if submit_button:
+                family_state.update_family({
+                    'important_family_activity': important_family_activity,
+                    'time_spent_together': time_spent_together,
+                    'desired_activity': desired_activity,
+                })
+
+            start_analyzing = st.button("가족 유형 확인")
+
+            if start_analyzing:
+                if family_state.is_complete():
+                    with st.spinner("가족 유형을 분석 중이에요! 조금만 기다려주세요!"):
+                        dirty_members = family_state.dirty_members()
+                        # 가족 폼을 빈 칸으로 제출하면 요약할 내용이 없으므로, 요약 여부는 답변 dict 가 아니라 만들어진 텍스트로 정합니다.
+                        family_text = format_family_information(family_state.family_answers) if family_state.family_dirty else ""
+                        if family_state.family_dirty and not family_text:
+                            family_state.family_summary = None
+                            family_state.family_dirty = False
+                        summarize_job = None
+                        if dirty_members or family_text:
+                            summarize_job = job_queue.run('summarize', {
+                                'members': [format_member_information(member.answers) for member in dirty_members],
+                                'family': family_text or None,
+                            })
+                        if summarize_job is not None and summarize_job['status'] == DONE:
+                            summaries = summarize_job['result']['summaries']
+                            for member, summary in zip(dirty_members, summaries):
+                                member.summary = summary
+                                member.dirty = False
+                            if family_text:
+                                family_state.family_summary = summaries[len(dirty_members)]
+                                family_state.family_dirty = False
+
+                        classify_job = None
+                        if summarize_job is None or summarize_job['status'] == DONE:
+                            # 누적 요약마다 GPT-4를 부르지 않고, 완성된 가족 정보 전체로 한 번만 추출합니다.
+                            classify_key = job_queue.submit('classify', {'summaries': family_state.summaries()})
+                            st.query_params['classify_job'] = classify_key
+                            classify_job = job_queue.wait(classify_key)
+
+                    if classify_job is not None and classify_job['status'] == DONE:
+                        apply_classification(classify_job['result'])
+                        if summarize_job is not None:
+                            summary_usages = summarize_job['result']['usages']
+                            st.caption(f"요약 {len(summary_usages)}건 : {summarize_job['result']['latency']:.2f}초 (순차 실행 시 {sum(u['latency'] for u in summary_usages):.2f}초)")
+                        usage = classify_job['result']['usage']
+                        st.caption(f"정보 추출 ({usage['model']}) : 입력 {usage['prompt_tokens']} 토큰, 출력 {usage['completion_tokens']} 토큰, {usage['latency']:.2f}초{' (캐시)' if usage['cached'] else ''}")
+                        if usage.get('fallback_from'):
+                            st.caption(f"요청이 몰려서 {usage['fallback_from']} 대신 {usage['model']} 로 정보를 추출했어요.")
+                    else:
+                        failed_job = classify_job or summarize_job
+                        st.error(f"가족 유형 분석에 실패했어요. 다시 시도해주세요. ({failed_job['error']})")
+                else:
+                    st.markdown(f'가족 정보를 마저 입력해주세요~! ({family_state.submitted_count()}/{num_members}명 입력됨)')
+
+        if st.session_state.classification is not None:
+            ranking = st.session_state.classification['ranking']
+            for result in ranking:
+                st.markdown(f"{result['family type']} 점수 : {100 * result['score']:.1f} (코사인 유사도 {result['similarity']:.4f})")
+
+            best_type = ranking[0]
+            st.markdown(f"가장 높은 유사도를 가진 가족 유형: {best_type['family type']} 점수 : {100 * best_type['score']:.1f}")
+
+    if option == "가족 미션 추출":
+        if st.session_state.family_type != []:
+            family_type = st.session_state.family_type[0]
+            st.header(f"FAMILY TYPE: {family_type['family type']}")
         
-        family_info_for_mission = ""
-        for summary in st.session_state.member_info:
-            family_info_for_mission += summary
-        family_info_for_mission += f"""가족 유형 : {family_type['family type']}, 해당 유형에 대한 설명: {family_type['type description']}"""
+            Additional_needs = st.chat_input('미션 생성에서 추가적으로 고려됐으면 하는 사항이 무엇인가요?')
         
-        if Additional_needs:
-            family_info_for_mission += Additional_needs
-            mission = client.chat.completions.create(
-                model='gpt-4-turbo-preview',
-                messages=[
-                    {'role': 'system', 'content': MISSION_GENERATOR_PROMPT},
-                    {'role': 'user', 'content': family_info_for_mission}
-                ],
-                stream=True
-            )
-            
-            with st.chat_message('assistant'):
-                for chunk in stream:
-                    if chunk.choices[0].delta.content is not None:
-                        st.markdown(chunk.choices[0].delta.content, end="")
-    else:
-        st.markdown('가족 유형 분석을 먼저 수행해주세요!')
\ No newline at end of file
+            if Additional_needs:
+                system_prompt, family_info_for_mission, prompt_tokens = build_mission_prompt(
+                    st.session_state.member_info,
+                    family_type,
+                    Additional_needs
+                )
+                mission_key = job_queue.submit('mission', {
+                    'system_prompt': system_prompt,
+                    'user_content': family_info_for_mission,
+                    'prompt_tokens': prompt_tokens,
+                    'family_type': family_type['family type'],
+                    'summaries': st.session_state.member_info,
+                    'additional_needs': Additional_needs,
+                })
+
+                # 이전 요청의 미션 생성이 아직 돌고 있으면 새 요청사항이 들어온 시점에 멈춥니다.
+                previous_key = st.query_params.get('mission_job')
+                if previous_key is not None and previous_key != mission_key:
+                    job_queue.cancel(previous_key)
+                st.query_params['mission_job'] = mission_key
+
+            if 'mission_job' in st.query_params:
+                mission_key = st.query_params['mission_job']
+                with st.chat_message('assistant'):
+                    st.write_stream(job_queue.stream_progress(mission_key))
+                mission_job = job_queue.get(mission_key)
+
+                if mission_job is not None and mission_job['status'] == DONE:
+                    mission = mission_job['result']
+                    if mission['reused'] is not None:
+                        st.caption(f"비슷한 가족에게 만든 미션을 재사용했어요 (가족 유사도 {mission['reused']['family_similarity']:.3f}, 요청사항 유사도 {mission['reused']['needs_similarity']:.3f})")
+                    elif mission['time_to_first_token'] is not None:
+                        st.caption(f"입력 {mission['prompt_tokens']} 토큰, 첫 토큰까지 {mission['time_to_first_token']:.2f}초, 전체 {mission['latency']:.2f}초")
+                elif mission_job is not None and mission_job['status'] == FAILED:
+                    st.error(f"미션 생성에 실패했어요. 다시 시도해주세요. ({mission_job['error']})")
+                elif mission_job is not None and mission_job['status'] == CANCELLED and not (mission_job['result'] or {}).get('text'):
+                    st.error("미션 생성이 중간에 멈췄어요. 요청사항을 다시 입력해주세요.")
+        else:
+            st.markdown('가족 유형 분석을 먼저 수행해주세요!')
+
+with st.sidebar.expander("디버그 : 단계별 소요 시간"):
+    spans = tracing.trace_spans(st.session_state.trace_id)
+    stage_totals = {}
+    for span in spans:
+        stage_totals[span['name']] = stage_totals.get(span['name'], 0) + span['duration_ms']
+    st.dataframe(
+        [{'단계': name, '누적(ms)': round(total, 1)} for name, total in stage_totals.items()],
+        hide_index=True
+    )
+    st.dataframe(
+        [
+            {
+                '단계': span['name'],
+                'ms': round(span['duration_ms'], 1),
+                '모델': span['attributes'].get('model'),
+                '입력 토큰': span['attributes'].get('prompt_tokens'),
+                '출력 토큰': span['attributes'].get('completion_tokens'),
+                '재시도': span['attributes'].get('retries'),
+                '캐시': span['attributes'].get('cached'),
+            }
+            for span in reversed(spans[-50:])
+        ],
+        hide_index=True
+    )
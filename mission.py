@@ -0,0 +1,71 @@
+import threading
+import time
+
+import tracing
+from llm import client, request, estimate_chat_tokens
+
+MISSION_MODEL = 'gpt-4-turbo-preview'
+
+class MissionStream:
+    # st.write_stream 에 그대로 넘길 수 있는 토큰 스트림입니다.
+    # 다른 스레드(새 rerun)에서 cancel() 하면 다음 청크에서 멈추고 연결을 닫습니다.
+    def __init__(self, system_prompt, user_content, prompt_tokens=None, model=MISSION_MODEL):
+        self.system_prompt = system_prompt
+        self.user_content = user_content
+        self.prompt_tokens = prompt_tokens
+        self.model = model
+        self.text = ""
+        self.time_to_first_token = None
+        self.latency = None
+        self.cancelled = False
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def __iter__(self):
+        # 제너레이터 안에서 span 을 current 로 잡으면 yield 사이에 호출한 쪽까지 자식으로 묶이므로 직접 열고 닫습니다.
+        span = tracing.start_span('mission', model=self.model, prompt_tokens=self.prompt_tokens, cached=False)
+        start = time.perf_counter()
+        try:
+            response, attempt = request(
+                lambda: client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=[
+                        {'role': 'system', 'content': self.system_prompt},
+                        {'role': 'user', 'content': self.user_content}
+                    ],
+                    stream=True
+                ),
+                self.model,
+                estimate_chat_tokens(self.system_prompt, self.user_content, {}),
+                span=span
+            )
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            span.end()
+            raise
+        span.set(retries=attempt)
+        completion_tokens = 0
+        try:
+            for chunk in response:
+                if self._cancel_event.is_set():
+                    self.cancelled = True
+                    break
+                if not chunk.choices or chunk.choices[0].delta.content is None:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - start
+                self.text += chunk.choices[0].delta.content
+                completion_tokens += 1
+                yield chunk.choices[0].delta.content
+        finally:
+            # rerun 으로 스크립트가 중간에 끊겨도 남은 토큰을 받지 않도록 응답을 닫습니다.
+            response.close()
+            self.latency = time.perf_counter() - start
+            span.set(
+                completion_tokens=completion_tokens,
+                time_to_first_token_ms=None if self.time_to_first_token is None else 1000 * self.time_to_first_token,
+                cancelled=self.cancelled
+            )
+            span.end()
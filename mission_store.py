@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+# 생성한 미션을 가족 유형, 가족 요약 임베딩, 추가 요청사항 임베딩과 함께 저장해 두고,
+# 같은 유형에 요약과 요청사항이 둘 다 충분히 비슷한 가족이 오면 GPT-4 를 부르지 않고 저장된 미션을 돌려줍니다.
+MISSION_STORE_PATH = os.getenv('FAIM_MISSION_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'missions.sqlite3'))
+# ada 임베딩은 관계없는 글끼리도 0.7~0.85 가 나오므로 거의 같은 가족/요청만 걸리도록 높게 잡습니다.
+FAMILY_THRESHOLD = float(os.getenv('FAIM_MISSION_FAMILY_THRESHOLD', '0.97'))
+NEEDS_THRESHOLD = float(os.getenv('FAIM_MISSION_NEEDS_THRESHOLD', '0.95'))
+DEFAULT_TTL = 3 * 24 * 60 * 60
+# 자주 나오는 가족 유형도 같은 미션만 계속 받지 않도록 이만큼 재사용하면 버리고 새로 생성합니다.
+MAX_REUSES = 20
+MAX_ENTRIES = 2000
+
+def unit_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class MissionStore:
+    def __init__(self, path=MISSION_STORE_PATH, family_threshold=FAMILY_THRESHOLD, needs_threshold=NEEDS_THRESHOLD,
+                 ttl=DEFAULT_TTL, max_reuses=MAX_REUSES, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.family_threshold = family_threshold
+        self.needs_threshold = needs_threshold
+        self.ttl = ttl
+        self.max_reuses = max_reuses
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS missions (
+                    id INTEGER PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    family_type TEXT NOT NULL,
+                    additional_needs TEXT NOT NULL,
+                    family_vector BLOB NOT NULL,
+                    needs_vector BLOB NOT NULL,
+                    mission TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    reuses INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS missions_type ON missions (backend, family_type)")
+        return self._conn
+
+    def lookup(self, backend, family_type, family_vector, additional_needs, needs_vector):
+        # 같은 백엔드/유형의 신선한 항목만 꺼내서 행렬곱 한 번으로 가장 가까운 가족을 찾습니다.
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                """SELECT id, additional_needs, family_vector, needs_vector, mission FROM missions
+                WHERE backend = ? AND family_type = ? AND created_at >= ? AND reuses < ?""",
+                (backend, family_type, now - self.ttl, self.max_reuses)
+            ).fetchall()
+            if not rows:
+                self.misses += 1
+                return None
+
+            family_matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+            needs_matrix = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows])
+            family_similarity = family_matrix @ unit_vector(family_vector)
+            # 해싱 백엔드는 한글 요청사항을 0 벡터로 만들기 때문에 글자가 같으면 유사도 1로 봅니다.
+            needs_similarity = np.where(
+                [row[1] == additional_needs for row in rows], 1.0, needs_matrix @ unit_vector(needs_vector)
+            )
+            eligible = (family_similarity >= self.family_threshold) & (needs_similarity >= self.needs_threshold)
+            if not eligible.any():
+                self.misses += 1
+                return None
+
+            best = int(np.argmax(np.where(eligible, family_similarity + needs_similarity, -np.inf)))
+            conn.execute("UPDATE missions SET accessed_at = ?, reuses = reuses + 1 WHERE id = ?", (now, rows[best][0]))
+            conn.commit()
+            self.hits += 1
+            return {
+                'mission': rows[best][4],
+                'family_similarity': float(family_similarity[best]),
+                'needs_similarity': float(needs_similarity[best]),
+            }
+
+    def add(self, backend, family_type, family_vector, additional_needs, needs_vector, mission):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                """INSERT INTO missions (backend, family_type, additional_needs, family_vector, needs_vector, mission, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (backend, family_type, additional_needs, unit_vector(family_vector).tobytes(),
+                 unit_vector(needs_vector).tobytes(), mission, now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM missions WHERE created_at < ? OR reuses >= ?", (now - self.ttl, self.max_reuses))
+        conn.execute(
+            """DELETE FROM missions WHERE id IN (
+                SELECT id FROM missions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM missions")
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM missions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+mission_store = MissionStore()
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        mission_store.clear()
+    print(mission_store.stats())
@@ -0,0 +1,82 @@
+import re
+import warnings
+from functools import lru_cache
+
+import tiktoken
+
+from prompts import INFORMATION_EXTRACTOR_PROMPT, MISSION_GENERATOR_PROMPT
+
+# gpt-3.5-turbo / gpt-4-turbo / ada-002 는 모두 cl100k_base 토크나이저를 씁니다.
+ENCODING_NAME = 'cl100k_base'
+# chat 메시지 하나마다 role 등 포맷 때문에 붙는 토큰 수 (OpenAI cookbook 기준)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+EXTRACTION_TOKEN_BUDGET = 4000
+MISSION_TOKEN_BUDGET = 4000
+
+class ApproximateEncoding:
+    # tiktoken 은 처음 쓸 때 BPE 파일을 내려받습니다. 오프라인(CI, 벤치마크)이라 못 받으면
+    # 단어/공백/문장부호 단위로 자르는 근사치로 대신합니다. 공백도 세기 때문에 실제보다 많게 세어서 예산을 넘기지는 않습니다.
+    def encode(self, text):
+        return re.findall(r"\s+|\w+|[^\w\s]", text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        warnings.warn(f"tiktoken {ENCODING_NAME} 을 불러오지 못해 근사 토큰 수를 씁니다: {e}")
+        return ApproximateEncoding()
+
+def count_tokens(text):
+    return len(get_encoding().encode(text))
+
+def count_message_tokens(system_prompt, user_content):
+    return 2 * TOKENS_PER_MESSAGE + count_tokens(system_prompt) + count_tokens(user_content) + TOKENS_PER_REPLY
+
+def dedupe_summaries(summaries):
+    seen = set()
+    unique = []
+    for summary in summaries:
+        summary = summary.strip()
+        key = re.sub(r"\s+", " ", summary).lower()
+        if summary and key not in seen:
+            seen.add(key)
+            unique.append(summary)
+    return unique
+
+def fit_summaries(summaries, token_budget):
+    # 예산을 넘으면 가장 긴 요약부터 잘라서, 짧은 구성원 요약이 통째로 빠지는 일이 없게 합니다.
+    encoding = get_encoding()
+    tokens = [encoding.encode(summary) for summary in summaries]
+    if sum(len(t) for t in tokens) <= token_budget:
+        return summaries
+
+    remaining = max(token_budget, 0)
+    limits = {}
+    for count, i in enumerate(sorted(range(len(tokens)), key=lambda i: len(tokens[i]))):
+        share = remaining // (len(tokens) - count)
+        limits[i] = min(len(tokens[i]), share)
+        remaining -= limits[i]
+    return [encoding.decode(tokens[i][:limits[i]]) for i in range(len(tokens)) if limits[i] > 0]
+
+def build_extraction_prompt(summaries, token_budget=EXTRACTION_TOKEN_BUDGET):
+    # 시스템 프롬프트(고정)가 항상 맨 앞에 오므로 provider 쪽 prompt caching 의 prefix 로 잡힙니다.
+    static_tokens = count_message_tokens(INFORMATION_EXTRACTOR_PROMPT, "")
+    summaries = fit_summaries(dedupe_summaries(summaries), token_budget - static_tokens)
+    user_content = "\n".join(summaries)
+    return INFORMATION_EXTRACTOR_PROMPT, user_content, count_message_tokens(INFORMATION_EXTRACTOR_PROMPT, user_content)
+
+def build_mission_prompt(summaries, family_type, additional_needs="", token_budget=MISSION_TOKEN_BUDGET):
+    # 고정 프롬프트 → 유형 설명(같은 유형이면 동일) → 가족 요약 → 추가 요청 순으로,
+    # 바뀌지 않는 내용이 앞쪽에 모이게 해서 같은 유형의 가족끼리 prefix 를 공유하게 합니다.
+    type_block = f"가족 유형 : {family_type['family type']}, 해당 유형에 대한 설명: {family_type['type description']}\n\n"
+    needs_block = f"\n\n추가 요청사항 : {additional_needs}" if additional_needs else ""
+    static_tokens = count_message_tokens(MISSION_GENERATOR_PROMPT, type_block + needs_block)
+    summaries = fit_summaries(dedupe_summaries(summaries), token_budget - static_tokens)
+    user_content = type_block + "가족 구성원 정보 :\n" + "\n".join(summaries) + needs_block
+    return MISSION_GENERATOR_PROMPT, user_content, count_message_tokens(MISSION_GENERATOR_PROMPT, user_content)
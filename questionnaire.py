@@ -0,0 +1,45 @@
+MEMBER_FIELDS = ['name', 'sex', 'age', 'hobby', 'job', 'weekend']
+
+FAMILY_FIELDS = [
+    ('important_family_activity', 'Important family activity'),
+    ('time_spent_together', 'Time spent together'),
+    ('desired_activity', 'Desired activity'),
+]
+
+def format_member_information(member):
+    role = member['role']
+    lines = [f"Role in family : {role}"]
+    for field in MEMBER_FIELDS:
+        if member.get(field) not in (None, ''):
+            lines.append(f"{role}'s {field} : {member[field]}")
+    return ",\n".join(lines)
+
+def format_family_information(family):
+    lines = []
+    for field, label in FAMILY_FIELDS:
+        if family.get(field) not in (None, ''):
+            lines.append(f"{label} : {family[field]}")
+    return ",\n".join(lines)
+
+# (화면에 보이는 역할, 프롬프트에 들어가는 역할)
+ROLE_OPTIONS = [
+    ('아빠', 'Dad'),
+    ('엄마', 'Mom'),
+    ('자식', 'child'),
+    ('할아버지', 'Grandfather'),
+    ('할머니', 'Grandmother'),
+    ('기타 가족', 'Family member'),
+]
+
+MEMBER_QUESTIONS = [
+    ('name', "이름은 무엇인가요?"),
+    ('sex', "성별은 무엇인가요?"),
+    ('age', "나이가 어떻게 되나요?"),
+    ('hobby', "취미는 무엇인가요?"),
+    ('job', "직업이 어떻게 되시나요?"),
+    ('weekend', "주말에 주로 뭘 하나요?"),
+]
+
+def default_role_index(member_id):
+    # 첫 번째는 아빠, 두 번째는 엄마, 나머지는 자식으로 기본값을 둡니다.
+    return member_id if member_id < 2 else 2
@@ -0,0 +1,243 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# 모든 OpenAI 호출이 보내기 전에 여기서 모델별 요청/토큰 버킷을 통과합니다.
+# 버킷 크기와 남은 양은 응답의 x-ratelimit-* 헤더로 맞추고, 429 를 받으면 retry-after 동안 그 모델로는 보내지 않습니다.
+# 헤더를 한 번도 못 본 모델은 한도를 모르므로 막지 않습니다.
+#
+# 버킷이 비면 호출을 실패시키지 않고 우선순위 순서로 줄을 세웁니다. 같은 프로세스 안에서는 INTERACTIVE 호출이 BULK 호출보다 먼저 나갑니다.
+# 스케줄러는 프로세스마다 따로라서 bulk_classify 처럼 다른 프로세스에서 도는 일괄 작업과는 줄을 공유하지 못합니다.
+# 그래서 BULK 호출은 헤더로 알게 된 한도 중 BULK_RESERVE 만큼은 남겨두고 그 아래에서만 나갑니다.
+# 남은 양은 헤더로 프로세스 사이에 공유되므로, 일괄 작업이 돌고 있어도 streamlit 앱이 쓸 몫이 남습니다.
+INTERACTIVE = 0
+BULK = 1
+BULK_RESERVE = float(os.getenv('FAIM_BULK_RESERVE', '0.3'))
+ASYNC_POLL_INTERVAL = 0.05
+
+_priority = contextvars.ContextVar('faim_priority', default=INTERACTIVE)
+
+def set_priority(priority):
+    _priority.set(priority)
+
+@contextmanager
+def priority(value):
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def parse_duration(value):
+    # x-ratelimit-reset-* 헤더는 "20ms", "1.5s", "6m0s" 같은 형식입니다.
+    if not value:
+        return None
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    # 분당 capacity 만큼 채워지는 버킷입니다. capacity 가 None 이면 한도를 모르는 상태라 항상 통과합니다.
+    def __init__(self):
+        self.capacity = None
+        self.available = 0.0
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        if self.capacity is not None:
+            self.available = min(self.capacity, self.available + (now - self.updated_at) * self.capacity / 60)
+        self.updated_at = now
+
+    def deficit_seconds(self, amount, reserve=0.0):
+        # reserve 는 가져간 뒤에도 남겨둬야 하는 capacity 비율입니다.
+        if self.capacity is None:
+            return 0.0
+        amount = min(amount, self.capacity * (1 - reserve))
+        return max(0.0, (amount + self.capacity * reserve - self.available) * 60 / self.capacity)
+
+    def take(self, amount):
+        if self.capacity is not None:
+            self.available -= min(amount, self.capacity)
+
+    def observe(self, limit, remaining, now):
+        self.refill(now)
+        if self.capacity is None:
+            self.available = float(limit if remaining is None else remaining)
+        self.capacity = limit
+        # 헤더의 남은 양은 다른 프로세스가 쓴 몫까지 반영된 값이라 우리 추정치보다 적으면 그쪽을 믿습니다.
+        if remaining is not None:
+            self.available = min(self.available, remaining)
+
+class ModelState:
+    def __init__(self):
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+        self.blocked_until = 0.0
+        self.waiters = []
+
+    def refill(self, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+
+class RateLimitScheduler:
+    def __init__(self):
+        self._models = {}
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+
+    def _state(self, model):
+        if model not in self._models:
+            self._models[model] = ModelState()
+        return self._models[model]
+
+    def _try_take(self, state, ticket):
+        # 줄 맨 앞이 아니면 None, 맨 앞이면 보낼 수 있을 때까지 남은 초(0 이면 방금 가져감)를 돌려줍니다.
+        if state.waiters[0] is not ticket:
+            return None
+        now = time.monotonic()
+        state.refill(now)
+        tokens = ticket[2]
+        reserve = BULK_RESERVE if ticket[0] >= BULK else 0.0
+        wait = max(
+            state.blocked_until - now,
+            state.requests.deficit_seconds(1, reserve),
+            state.tokens.deficit_seconds(tokens, reserve)
+        )
+        if wait > 0:
+            return wait
+        state.requests.take(1)
+        state.tokens.take(tokens)
+        return 0
+
+    def _enter(self, model, tokens, priority):
+        state = self._state(model)
+        ticket = (_priority.get() if priority is None else priority, next(self._sequence), tokens)
+        heapq.heappush(state.waiters, ticket)
+        return state, ticket
+
+    def _leave(self, state, ticket):
+        state.waiters.remove(ticket)
+        heapq.heapify(state.waiters)
+        self._cond.notify_all()
+
+    def acquire(self, model, tokens=0, priority=None):
+        start = time.monotonic()
+        with self._cond:
+            state, ticket = self._enter(model, tokens, priority)
+            try:
+                while True:
+                    wait = self._try_take(state, ticket)
+                    if wait == 0:
+                        return time.monotonic() - start
+                    self._cond.wait(wait)
+            finally:
+                self._leave(state, ticket)
+
+    async def aacquire(self, model, tokens=0, priority=None):
+        # 이벤트 루프를 막지 않도록 lock 은 잠깐씩만 잡고 기다리는 동안은 asyncio.sleep 으로 양보합니다.
+        start = time.monotonic()
+        with self._cond:
+            state, ticket = self._enter(model, tokens, priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(state, ticket)
+                if wait == 0:
+                    return time.monotonic() - start
+                await asyncio.sleep(ASYNC_POLL_INTERVAL if wait is None else wait)
+        finally:
+            with self._cond:
+                self._leave(state, ticket)
+
+    def observe(self, model, headers):
+        limit_requests = parse_int(headers.get('x-ratelimit-limit-requests'))
+        limit_tokens = parse_int(headers.get('x-ratelimit-limit-tokens'))
+        with self._cond:
+            state = self._state(model)
+            now = time.monotonic()
+            if limit_requests:
+                state.requests.observe(limit_requests, parse_int(headers.get('x-ratelimit-remaining-requests')), now)
+            if limit_tokens:
+                state.tokens.observe(limit_tokens, parse_int(headers.get('x-ratelimit-remaining-tokens')), now)
+            self._cond.notify_all()
+
+    def penalize(self, model, headers):
+        # 429 를 받으면 retry-after 가 지날 때까지 이 모델로 나가는 호출을 모두 세워둡니다.
+        retry_after = parse_duration(headers.get('retry-after-ms'))
+        retry_after = retry_after / 1000 if retry_after is not None else parse_duration(headers.get('retry-after'))
+        if retry_after is None:
+            retry_after = max(
+                parse_duration(headers.get('x-ratelimit-reset-requests')) or 0,
+                parse_duration(headers.get('x-ratelimit-reset-tokens')) or 0,
+            ) or 1.0
+        self.observe(model, headers)
+        with self._cond:
+            state = self._state(model)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+        return retry_after
+
+    def settle(self, model, estimated_tokens, used_tokens):
+        # 보내기 전에 어림잡아 뺀 토큰을 실제 사용량으로 맞춥니다.
+        with self._cond:
+            bucket = self._state(model).tokens
+            if bucket.capacity is not None:
+                bucket.available = min(bucket.capacity, bucket.available + estimated_tokens - used_tokens)
+            self._cond.notify_all()
+
+    def pressure(self, model, tokens=0, priority=None):
+        # 지금 이 우선순위로 줄을 서면 대략 몇 초 기다려야 하는지 돌려줍니다.
+        priority = _priority.get() if priority is None else priority
+        with self._cond:
+            state = self._state(model)
+            now = time.monotonic()
+            state.refill(now)
+            ahead = [ticket for ticket in state.waiters if ticket[0] <= priority]
+            reserve = BULK_RESERVE if priority >= BULK else 0.0
+            return max(
+                state.blocked_until - now,
+                state.requests.deficit_seconds(len(ahead) + 1, reserve),
+                state.tokens.deficit_seconds(sum(ticket[2] for ticket in ahead) + tokens, reserve),
+                0.0
+            )
+
+    def choose_model(self, model, fallback, tokens=0, max_wait=5.0):
+        # 원래 모델로 max_wait 초 넘게 기다려야 하고 대체 모델이 더 빨리 나갈 수 있으면 대체 모델을 씁니다.
+        wait = self.pressure(model, tokens)
+        if wait > max_wait and self.pressure(fallback, tokens) < wait:
+            return fallback
+        return model
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            stats = {}
+            for model, state in self._models.items():
+                state.refill(now)
+                stats[model] = {
+                    'rpm': state.requests.capacity,
+                    'tpm': state.tokens.capacity,
+                    'available_requests': state.requests.available,
+                    'available_tokens': state.tokens.available,
+                    'queued': len(state.waiters),
+                    'blocked_for': max(0.0, state.blocked_until - now),
+                }
+            return stats
+
+scheduler = RateLimitScheduler()
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+import tracing
+from llm import achat_completion, make_async_client, MAX_CONCURRENT_CALLS
+from prompts import MEMBER_SUMMARIZER_PROMPT, FAMILY_SUMMARIZER_PROMPT
+
+SUMMARIZER_MODEL = 'gpt-3.5-turbo-0125'
+
+async def summarize_family_async(member_informations, family_information=None, aclient=None, semaphore=None, max_concurrency=MAX_CONCURRENT_CALLS):
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+    jobs = [(MEMBER_SUMMARIZER_PROMPT, information) for information in member_informations]
+    if family_information:
+        jobs.append((FAMILY_SUMMARIZER_PROMPT, family_information))
+    if not jobs:
+        return []
+
+    async def run(aclient):
+        return await asyncio.gather(*[
+            achat_completion(aclient, semaphore, SUMMARIZER_MODEL, system_prompt, information)
+            for system_prompt, information in jobs
+        ])
+
+    with tracing.span('summarize', members=len(member_informations)):
+        if aclient is not None:
+            return await run(aclient)
+        async with make_async_client() as aclient:
+            return await run(aclient)
+
+def summarize_family(member_informations, family_information=None, max_concurrency=MAX_CONCURRENT_CALLS):
+    # 구성원/가족 요약을 동시에 보내므로 전체 시간은 가장 느린 호출 하나 정도가 됩니다.
+    start = time.perf_counter()
+    results = asyncio.run(summarize_family_async(member_informations, family_information, max_concurrency=max_concurrency))
+    summaries = [summary for summary, _ in results]
+    usages = [usage for _, usage in results]
+    return summaries, usages, time.perf_counter() - start
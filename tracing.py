@@ -0,0 +1,109 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 파이프라인 단계별 span 을 남깁니다. 한 줄에 span 하나씩 OpenTelemetry span 과 같은 필드 이름
+# (trace_id, span_id, parent_span_id, start/end_time_unix_nano, attributes)으로 JSONL 에 기록하고,
+# 최근 span 은 메모리에도 들고 있어서 streamlit 디버그 패널에서 현재 세션 것만 골라 보여줍니다.
+TRACE_PATH = os.getenv('FAIM_TRACE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces', 'spans.jsonl'))
+MAX_RECENT_SPANS = 5000
+
+_current_trace_id = contextvars.ContextVar('faim_trace_id', default=None)
+_current_span = contextvars.ContextVar('faim_span', default=None)
+# 다른 스레드에서 이어받은 부모 span id 입니다. 현재 span 이 없을 때 새 span 의 부모가 됩니다.
+_remote_parent_id = contextvars.ContextVar('faim_remote_parent_id', default=None)
+_recent_spans = deque(maxlen=MAX_RECENT_SPANS)
+_lock = threading.Lock()
+_file = None
+
+def new_id(num_bytes=8):
+    return secrets.token_hex(num_bytes)
+
+def set_trace_id(trace_id, parent_span_id=None):
+    # streamlit 은 세션마다 다른 스레드에서 스크립트를 돌리므로 rerun 시작 때마다 세션의 trace id 를 다시 넣어줍니다.
+    # 작업 큐 워커처럼 다른 스레드의 span 아래로 이어 붙일 때는 parent_span_id 도 같이 넘깁니다.
+    _current_trace_id.set(trace_id)
+    _remote_parent_id.set(parent_span_id)
+
+def current_trace_id():
+    return _current_trace_id.get()
+
+def current_span():
+    return _current_span.get()
+
+class Span:
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else (_current_trace_id.get() or new_id(16))
+        self.span_id = new_id()
+        self.parent_span_id = parent.span_id if parent is not None else _remote_parent_id.get()
+        self.attributes = attributes
+        self.start_time = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        export(self.to_dict())
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_span_id,
+            'name': self.name,
+            'start_time_unix_nano': self.start_time,
+            'end_time_unix_nano': self.start_time + int(self.duration * 1e9),
+            'duration_ms': 1000 * self.duration,
+            'attributes': self.attributes,
+        }
+
+def start_span(name, **attributes):
+    return Span(name, _current_span.get(), **attributes)
+
+@contextmanager
+def span(name, **attributes):
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def record_usage(current, usage):
+    current.set(
+        model=usage['model'],
+        prompt_tokens=usage['prompt_tokens'],
+        completion_tokens=usage['completion_tokens'],
+        retries=usage['retries'],
+        cached=usage['cached'],
+    )
+
+def export(record):
+    global _file
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock:
+        _recent_spans.append(record)
+        if _file is None:
+            os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+            _file = open(TRACE_PATH, 'a', encoding='utf-8')
+        _file.write(line + "\n")
+        _file.flush()
+
+def trace_spans(trace_id):
+    with _lock:
+        return [record for record in _recent_spans if record['trace_id'] == trace_id]
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from family_types import FAMILY_TYPES
+
+# 인덱스 포맷이 바뀌면 올려주세요. 버전이 다르면 기존 파일은 무시되고 새로 빌드됩니다.
+INDEX_VERSION = 1
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'type_index')
+
+def content_hash(family_types=FAMILY_TYPES):
+    documents = [[t['Document'], t['Family Type Description']] for t in family_types]
+    payload = json.dumps(documents, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def index_paths(model, family_types=FAMILY_TYPES):
+    name = f"{model.replace('/', '_')}-v{INDEX_VERSION}-{content_hash(family_types)}"
+    base = os.path.join(INDEX_DIR, name)
+    return base + '.npy', base + '.json'
+
+def build_type_index(backend, family_types=FAMILY_TYPES):
+    model = backend.name
+    vectors = np.asarray(
+        backend.embed([t['Family Type Description'] for t in family_types]),
+        dtype=np.float32,
+    )
+    meta = {
+        'version': INDEX_VERSION,
+        'model': model,
+        'content_hash': content_hash(family_types),
+        'family types': [t['Document'] for t in family_types],
+        'type descriptions': [t['Family Type Description'].strip() for t in family_types],
+    }
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    vector_path, meta_path = index_paths(model, family_types)
+    # 다른 프로세스가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓰고 교체합니다.
+    # 여러 프로세스가 동시에 빌드해도 서로의 임시 파일을 덮어쓰지 않도록 임시 파일 이름은 매번 새로 받습니다.
+    with tempfile.NamedTemporaryFile(dir=INDEX_DIR, suffix='.npy.tmp', delete=False) as f:
+        np.save(f, vectors)
+    vector_tmp = f.name
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=INDEX_DIR, suffix='.json.tmp', delete=False) as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    meta_tmp = f.name
+    os.replace(vector_tmp, vector_path)
+    os.replace(meta_tmp, meta_path)
+    return vector_path, meta_path
+
+def load_type_index(model, family_types=FAMILY_TYPES):
+    vector_path, meta_path = index_paths(model, family_types)
+    if not (os.path.exists(vector_path) and os.path.exists(meta_path)):
+        raise FileNotFoundError(
+            f"type index for {model} not found at {vector_path}. run `python type_index.py` first."
+        )
+
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    vectors = np.load(vector_path, mmap_mode='r')
+
+    type_vector = []
+    for i, family_type in enumerate(meta['family types']):
+        type_vector.append({
+            'family type': family_type,
+            'type description': meta['type descriptions'][i],
+            'embedded vector': vectors[i],
+        })
+    return type_vector
+
+def load_or_build_type_index(backend, family_types=FAMILY_TYPES):
+    try:
+        return load_type_index(backend.name, family_types)
+    except FileNotFoundError:
+        build_type_index(backend, family_types)
+        return load_type_index(backend.name, family_types)
+
+if __name__ == '__main__':
+    from embedding_backends import DEFAULT_BACKEND, get_backend
+
+    backend = get_backend(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BACKEND)
+    vector_path, meta_path = build_type_index(backend)
+    print(f"saved {vector_path}")
+    print(f"saved {meta_path}")